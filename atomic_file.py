@@ -0,0 +1,27 @@
+# Escritura atómica de ficheros: se escribe en un temporal del mismo directorio y se renombra
+# encima del destino, así que un corte o un error nunca dejan el fichero a medias ni vacío
+
+import json
+import os
+import tempfile
+
+
+def write_atomic(path, write, mode='w'):
+    """Llama a write(f) con un temporal y lo mueve a path; si falla, borra el temporal."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def write_text(path, text):
+    write_atomic(path, lambda f: f.write(text))
+
+
+def write_json(path, data, **kwargs):
+    write_atomic(path, lambda f: json.dump(data, f, **kwargs))
@@ -0,0 +1,31 @@
+# Espectrograma por bloques compartido por vad.py y highlights.py
+
+import librosa
+import numpy as np
+
+from audio_stream import SAMPLE_RATE
+
+FRAME_LENGTH = 1024
+HOP_LENGTH = 512
+# Las características se calculan por bloques para no tener el espectrograma de 5 horas en memoria
+BLOCK_SECONDS = 600
+
+
+def stft_blocks(audio):
+    """Genera el módulo de la STFT (center=False) del audio, bloque a bloque.
+
+    Cada bloque empieza en un múltiplo de HOP_LENGTH y lleva FRAME_LENGTH - HOP_LENGTH muestras
+    del siguiente, así que al concatenar los bloques salen los mismos frames que con la STFT del
+    audio entero: el frame i empieza en la muestra i * HOP_LENGTH, sin deriva entre bloques.
+    """
+    block = BLOCK_SECONDS * SAMPLE_RATE // HOP_LENGTH * HOP_LENGTH
+    for start in range(0, len(audio), block):
+        chunk = audio[start:start + block + FRAME_LENGTH - HOP_LENGTH]
+        if len(chunk) < FRAME_LENGTH:
+            break
+        yield np.abs(librosa.stft(chunk, n_fft=FRAME_LENGTH, hop_length=HOP_LENGTH, center=False))
+
+
+def frame_time(index):
+    """Instante en segundos en el que empieza el frame index."""
+    return index * HOP_LENGTH / SAMPLE_RATE
@@ -0,0 +1,159 @@
+# Lectura de audio PCM directamente de la salida de ffmpeg, sin ficheros temporales
+
+import queue
+import subprocess
+import threading
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def load_audio(path, start=None, duration=None):
+    """Decodifica un fichero (o solo el tramo [start, start + duration)) a float32 mono de 16 kHz."""
+    command = ["ffmpeg", "-nostdin", "-loglevel", "error"]
+    if start is not None:
+        command += ["-ss", str(start)]
+    if duration is not None:
+        command += ["-t", str(duration)]
+    command += ["-i", path, "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-"]
+    output = subprocess.run(command, capture_output=True, check=True).stdout
+    return np.frombuffer(output, np.int16).astype(np.float32) / 32768.0
+
+
+class PCMStream:
+    """Decodifica una URL con ffmpeg a PCM mono de 16 kHz y lo entrega en ventanas fijas.
+
+    Un hilo lee la salida estándar de ffmpeg sobre un número fijo de buffers
+    preasignados mientras el consumidor transcribe la ventana anterior, así que la
+    descarga y la transcripción se solapan y la memoria no crece con la duración.
+
+    Con overlap_seconds cada ventana empieza con los últimos overlap_seconds de la
+    anterior, para que las palabras que caen en el corte salgan enteras en alguna de las dos.
+    """
+
+    def __init__(self, url, window_seconds=300, start=None, buffers=3, overlap_seconds=0):
+        self.url = url
+        self.window_samples = int(window_seconds * SAMPLE_RATE)
+        self.overlap_samples = int(overlap_seconds * SAMPLE_RATE)
+        self.start = start
+        self.free = queue.Queue()
+        self.ready = queue.Queue()
+        for _ in range(buffers):
+            self.free.put(np.empty(self.window_samples, dtype=np.int16))
+        # La ventana que se entrega al transcriptor, ya en float32, con sitio para el solape
+        self.window = np.empty(self.overlap_samples + self.window_samples, dtype=np.float32)
+        self.process = None
+        self.error = None
+
+    def _command(self):
+        command = ["ffmpeg", "-nostdin", "-loglevel", "error"]
+        if self.start:
+            command += ["-ss", self.start]
+        command += ["-i", self.url, "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-"]
+        return command
+
+    def _reader(self):
+        try:
+            stdout = self.process.stdout
+            while True:
+                buffer = self.free.get()
+                if buffer is None:
+                    break
+                view = memoryview(buffer).cast('B')
+                filled = 0
+                while filled < len(view):
+                    n = stdout.readinto(view[filled:])
+                    if not n:
+                        break
+                    filled += n
+                samples = filled // 2
+                if samples:
+                    self.ready.put((buffer, samples))
+                if filled < len(view):
+                    break
+        except Exception as e:
+            self.error = e
+        finally:
+            self.ready.put(None)
+
+    def __iter__(self):
+        """Devuelve (offset en segundos, ventana float32) por cada ventana de audio."""
+        self.process = subprocess.Popen(self._command(), stdout=subprocess.PIPE)
+        reader = threading.Thread(target=self._reader, daemon=True)
+        reader.start()
+        offset = 0
+        # Muestras del final de la ventana anterior que se repiten al principio de la siguiente
+        tail = 0
+        length = 0
+        finished = False
+        try:
+            while True:
+                item = self.ready.get()
+                if item is None:
+                    finished = True
+                    break
+                buffer, samples = item
+                if tail:
+                    self.window[:tail] = self.window[length - tail:length]
+                length = tail + samples
+                np.multiply(buffer[:samples], 1.0 / 32768.0, out=self.window[tail:length], casting='unsafe')
+                self.free.put(buffer)
+                yield (offset - tail) / SAMPLE_RATE, self.window[:length]
+                offset += samples
+                tail = min(self.overlap_samples, length)
+        finally:
+            # Si el consumidor para antes de tiempo, desbloquear al lector y cortar ffmpeg
+            self.free.put(None)
+            if not finished:
+                self.process.kill()
+            self.process.stdout.close()
+            self.process.wait()
+            reader.join()
+        if self.error is not None:
+            raise self.error
+        if self.process.returncode != 0:
+            raise subprocess.CalledProcessError(self.process.returncode, self._command())
+
+
+def ts_to_wav_chunked(ts_path, wav_path, block_seconds=60):
+    """Convierte el primer stream de audio de ts_path a WAV PCM mono de 16 kHz.
+
+    Un único AudioResampler de PyAV hace la conversión de formato, canales y frecuencia;
+    las muestras se acumulan en un buffer NumPy de block_seconds y se vuelcan de golpe al
+    WAV, así que la memoria está acotada sea cual sea la duración del vídeo.
+    """
+    import wave
+
+    import av
+
+    block = np.empty(int(block_seconds * SAMPLE_RATE), dtype=np.int16)
+    filled = 0
+    resampler = av.AudioResampler(format='s16', layout='mono', rate=SAMPLE_RATE)
+    with av.open(ts_path) as container, \
+            open(wav_path, 'wb', buffering=1 << 20) as raw, \
+            wave.open(raw, 'wb') as output:
+        output.setnchannels(1)
+        output.setsampwidth(2)
+        output.setframerate(SAMPLE_RATE)
+        stream = container.streams.audio[0]
+        stream.thread_type = 'AUTO'
+
+        def write(samples):
+            nonlocal filled
+            while len(samples):
+                n = min(len(samples), len(block) - filled)
+                block[filled:filled + n] = samples[:n]
+                filled += n
+                samples = samples[n:]
+                if filled == len(block):
+                    output.writeframesraw(block.tobytes())
+                    filled = 0
+
+        for frame in container.decode(stream):
+            for resampled in resampler.resample(frame):
+                write(resampled.to_ndarray().reshape(-1))
+        # Vaciar lo que quede dentro del resampler
+        for resampled in resampler.resample(None):
+            write(resampled.to_ndarray().reshape(-1))
+        output.writeframesraw(block[:filled].tobytes())
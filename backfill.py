@@ -0,0 +1,157 @@
+# Recupera los resúmenes de directos antiguos que no están en el histórico
+#
+# Uso: python backfill.py [--limit N] [--download-workers 2] [--transcribe-workers 1] [--summarize-workers 2]
+#                         [--keep-audio]
+#
+# Las etapas van encadenadas con colas: mientras un vídeo se transcribe, el siguiente se
+# descarga y el anterior se resume, así que red, CPU y LLM trabajan a la vez.
+# Cada worker de transcripción carga su propio modelo, así que --transcribe-workers multiplica
+# la memoria del modelo de Whisper. El WAV de cada vídeo (cientos de MB en un directo de varias
+# horas) se borra en cuanto está resumido, salvo con --keep-audio.
+
+import argparse
+import os
+import queue
+import threading
+import time
+
+from history_store import HistoryStore
+from llm_cache import LLMCache
+from pipeline import Pipeline
+from summarize import Recap, client_id, client_secret, model
+
+# Grupos de etapas del pipeline que hace cada conjunto de workers
+GROUPS = (
+    ("download", ("fetch", "download")),
+    ("transcribe", ("transcribe",)),
+    ("summarize", ("summarize",)),
+)
+
+
+def find_missing(recap, history, limit=None):
+    """Vídeos del canal que no están en el histórico o no tienen resumen, del más antiguo al más reciente."""
+    missing = []
+    for video in recap.iter_videos():
+        entry = history.get(video['id'])
+        if entry is None or entry["summary_long"] == "":
+            missing.append(video)
+    missing.reverse()
+    return missing[:limit] if limit else missing
+
+
+class Backfill:
+    def __init__(self, recap, history, workers, work_dir='work', keep_audio=False):
+        self.recap = recap
+        self.history = history
+        self.workers = workers
+        self.work_dir = work_dir
+        self.keep_audio = keep_audio
+        # Colas acotadas entre etapas: la descarga no se adelanta demasiado a la transcripción
+        self.queues = {name: queue.Queue(maxsize=0 if i == 0 else workers[name] * 2)
+                       for i, (name, _) in enumerate(GROUPS)}
+        self.active = {name: 0 for name, _ in GROUPS}
+        self.done = 0
+        self.failed = 0
+        self.lock = threading.Lock()
+
+    def _worker(self, index):
+        name, stages = GROUPS[index]
+        inbox = self.queues[name]
+        outbox = self.queues[GROUPS[index + 1][0]] if index + 1 < len(GROUPS) else None
+        while True:
+            pipeline = inbox.get()
+            if pipeline is None:
+                inbox.task_done()
+                break
+            with self.lock:
+                self.active[name] += 1
+            try:
+                for stage in stages:
+                    pipeline.run_stage(stage)
+                if outbox is not None:
+                    outbox.put(pipeline)
+                else:
+                    if not self.keep_audio:
+                        pipeline.remove_audio()
+                    with self.lock:
+                        self.done += 1
+            except Exception as e:
+                print(f"[{pipeline.video_id}] Error en {name}: {e}")
+                with self.lock:
+                    self.failed += 1
+            finally:
+                with self.lock:
+                    self.active[name] -= 1
+                inbox.task_done()
+
+    def _monitor(self, total, start, stop, interval):
+        while not stop.wait(interval):
+            with self.lock:
+                finished = self.done + self.failed
+                state = ", ".join(f"{name}: {self.queues[name].qsize()} en cola/{self.active[name]} activos"
+                                  for name, _ in GROUPS)
+            elapsed = time.monotonic() - start
+            eta = elapsed / finished * (total - finished) if finished else None
+            eta_text = f"{eta / 60:.0f} min" if eta is not None else "?"
+            print(f"[backfill] {finished}/{total} vídeos ({self.failed} con error) | {state} | ETA {eta_text}")
+
+    def run(self, videos, report_interval=60):
+        start = time.monotonic()
+        threads = []
+        for index, (name, _) in enumerate(GROUPS):
+            for _ in range(self.workers[name]):
+                thread = threading.Thread(target=self._worker, args=(index,), daemon=True)
+                thread.start()
+                threads.append((name, thread))
+        stop = threading.Event()
+        monitor = threading.Thread(target=self._monitor, args=(len(videos), start, stop, report_interval),
+                                   daemon=True)
+        monitor.start()
+
+        for video in videos:
+            self.queues[GROUPS[0][0]].put(Pipeline(self.recap, self.history, video['id'], model,
+                                                   work_dir=self.work_dir, update_last=False,
+                                                   date=video.get('created_at')))
+        # Cerrar las etapas en orden: cuando una cola se vacía, sus workers ya no van a producir más
+        for name, _ in GROUPS:
+            self.queues[name].join()
+            for _ in range(self.workers[name]):
+                self.queues[name].put(None)
+            for thread_name, thread in threads:
+                if thread_name == name:
+                    thread.join()
+        stop.set()
+        monitor.join()
+        print(f"Backfill terminado: {self.done} vídeos resumidos, {self.failed} con error, "
+              f"en {(time.monotonic() - start) / 60:.1f} min")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resume los directos antiguos que faltan en el histórico")
+    parser.add_argument("--limit", type=int, help="Número máximo de vídeos a procesar")
+    parser.add_argument("--download-workers", type=int, default=2)
+    parser.add_argument("--transcribe-workers", type=int, default=1,
+                        help="Cada worker carga su propio modelo de Whisper: cuenta con la memoria de uno por worker")
+    parser.add_argument("--summarize-workers", type=int, default=2)
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Volver a preguntar al LLM aunque ya haya respuesta guardada")
+    parser.add_argument("--keep-audio", action="store_true",
+                        help="Conservar work/<id>/audio.wav de cada vídeo después de resumirlo")
+    args = parser.parse_args()
+
+    llm_cache = None if args.no_cache else LLMCache()
+    recap = Recap('drpalanca', client_id=client_id, client_secret=client_secret, llm_cache=llm_cache)
+    migrate = not os.path.exists('history.db') and os.path.exists('history.json')
+    history = HistoryStore('history.db')
+    if migrate:
+        history.migrate_from_json('history.json')
+    videos = find_missing(recap, history, args.limit)
+    print(f"{len(videos)} vídeos sin resumen en el histórico")
+    backfill = Backfill(recap, history, {
+        "download": args.download_workers,
+        "transcribe": args.transcribe_workers,
+        "summarize": args.summarize_workers,
+    }, keep_audio=args.keep_audio)
+    backfill.run(videos)
+    if llm_cache is not None:
+        llm_cache.report()
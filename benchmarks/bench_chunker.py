@@ -0,0 +1,72 @@
+# Compara el troceado fijo de 32767 caracteres con chunker.chunk_segments sobre las transcripciones de history.json
+#
+# Uso: python benchmarks/bench_chunker.py [history.json] [modelo]
+
+import json
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunker import chunk_budget, chunk_segments, estimate_tokens, get_num_ctx, segments_from_text
+
+GROUP_SIZE = 4
+
+
+def llm_calls(chunks):
+    # Resúmenes parciales + uniones del árbol de summarize_text + el resumen corto
+    calls, level = len(chunks), len(chunks)
+    while level > 1:
+        groups = math.ceil(level / GROUP_SIZE)
+        calls += sum(1 for i in range(groups) if min(GROUP_SIZE, level - i * GROUP_SIZE) > 1)
+        level = groups
+    return calls + 1
+
+
+def cut_sentences(chunks):
+    # Trozos que terminan a mitad de frase
+    return sum(1 for chunk in chunks[:-1] if not chunk.rstrip().endswith(('.', '!', '?', '…')))
+
+
+def main():
+    history_path = sys.argv[1] if len(sys.argv) > 1 else 'history.json'
+    model = sys.argv[2] if len(sys.argv) > 2 else 'llama3.3:70b'
+    with open(history_path, 'r') as f:
+        history = json.load(f)
+    texts = [entry["transcription"] for entry in history["historic"].values() if entry["transcription"]]
+    num_ctx = get_num_ctx()
+
+    results = {}
+    for name in ("fijo 32767", "chunker"):
+        start = time.monotonic()
+        all_chunks = []
+        for text in texts:
+            if name == "chunker":
+                all_chunks.append(chunk_segments(segments_from_text(text), model))
+            else:
+                all_chunks.append([text[i:i + 32767] for i in range(0, len(text), 32767)])
+        elapsed = time.monotonic() - start
+        tokens = [estimate_tokens(chunk, model) for chunks in all_chunks for chunk in chunks]
+        results[name] = {
+            "chunks": len(tokens),
+            "calls": sum(llm_calls(chunks) for chunks in all_chunks),
+            "mean_tokens": sum(tokens) / len(tokens),
+            "max_tokens": max(tokens),
+            "over_ctx": sum(1 for t in tokens if t > chunk_budget(model, num_ctx)),
+            "cut": sum(cut_sentences(chunks) for chunks in all_chunks),
+            "seconds": elapsed,
+        }
+
+    print(f"{len(texts)} transcripciones, modelo {model}, num_ctx {num_ctx} "
+          f"(presupuesto por trozo {chunk_budget(model, num_ctx)} tokens)")
+    print(f"{'troceado':<12} {'trozos':>7} {'llamadas':>9} {'tokens medios':>14} {'tokens máx':>11} "
+          f"{'no caben':>9} {'frases cortadas':>16} {'tiempo (ms)':>12}")
+    for name, r in results.items():
+        print(f"{name:<12} {r['chunks']:>7} {r['calls']:>9} {r['mean_tokens']:>14.0f} {r['max_tokens']:>11} "
+              f"{r['over_ctx']:>9} {r['cut']:>16} {r['seconds'] * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# Compara motores de transcripción en un clip de referencia: WER y velocidad
+#
+# Uso: python benchmarks/bench_engines.py clip.wav referencia.txt whisper:medium faster-whisper:medium faster-whisper:small
+#
+# referencia.txt es la transcripción revisada a mano del clip.
+
+import os
+import re
+import sys
+import time
+import unicodedata
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_stream import SAMPLE_RATE, load_audio
+from transcription_engines import get_engine
+
+
+def normalize(text):
+    """Minúsculas, sin signos de puntuación y sin tildes, para no penalizar diferencias de formato."""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.findall(r"\w+", text)
+
+
+def word_error_rate(reference, hypothesis):
+    """Distancia de edición por palabras entre hipótesis y referencia, dividida por la longitud de la referencia."""
+    ref = normalize(reference)
+    hyp = normalize(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1,
+                             current[j - 1] + 1,
+                             previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1] / max(len(ref), 1)
+
+
+def main():
+    if len(sys.argv) < 4:
+        print("Uso: python benchmarks/bench_engines.py clip.wav referencia.txt motor:modelo [motor:modelo ...]")
+        sys.exit(1)
+    audio_path, reference_path, specs = sys.argv[1], sys.argv[2], sys.argv[3:]
+    with open(reference_path, 'r') as f:
+        reference = f.read()
+    audio = load_audio(audio_path)
+    duration = len(audio) / SAMPLE_RATE
+
+    print(f"Clip: {audio_path} ({duration:.0f}s)")
+    print(f"{'motor':<28} {'carga (s)':>10} {'transcr. (s)':>13} {'RTF':>6} {'WER':>7}")
+    for spec in specs:
+        name, _, model_name = spec.partition(":")
+        engine = get_engine(name, model_name or None)
+        start = time.monotonic()
+        engine.load()
+        load_time = time.monotonic() - start
+        start = time.monotonic()
+        result = engine.transcribe(audio, language="es")
+        elapsed = time.monotonic() - start
+        wer = word_error_rate(reference, result["text"])
+        print(f"{repr(engine):<28} {load_time:>10.1f} {elapsed:>13.1f} {elapsed / duration:>6.2f} {wer:>7.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# Compara el resumen con preselección extractiva frente al resumen del texto completo
+#
+# Uso: python benchmarks/bench_extractive.py [--videos 3] [--budget 6000]
+#
+# Usa las transcripciones de history.json y llama de verdad al LLM configurado en
+# summarize.py (sin caché), así que tarda lo mismo que resumir esos directos dos veces.
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from summarize import Recap, model
+
+
+def rouge1(candidate, reference):
+    """F1 de unigramas entre dos textos, como medida de solapamiento entre resúmenes."""
+    a = Counter(re.findall(r"\w+", candidate.lower()))
+    b = Counter(re.findall(r"\w+", reference.lower()))
+    overlap = sum((a & b).values())
+    if not overlap:
+        return 0.0
+    precision, recall = overlap / sum(a.values()), overlap / sum(b.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def run(recap, text, budget):
+    start = len(recap.llm_stats)
+    t0 = time.monotonic()
+    summary_long, _ = recap.summarize_text(text, recap.username, extractive_budget=budget)
+    elapsed = time.monotonic() - t0
+    calls = recap.llm_stats[start:]
+    return summary_long, elapsed, len(calls), sum(stats["prompt_tokens"] for stats in calls)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--history", default="history.json")
+    parser.add_argument("--videos", type=int, default=3)
+    parser.add_argument("--budget", type=int, default=6000)
+    args = parser.parse_args()
+
+    with open(args.history, 'r') as f:
+        history = json.load(f)
+    entries = [(video_id, entry) for video_id, entry in history["historic"].items()
+               if entry["transcription"] and entry["summary_long"]][-args.videos:]
+    recap = Recap('drpalanca')
+
+    print(f"Modelo {model}, presupuesto extractivo {args.budget} tokens")
+    print(f"{'vídeo':<12} {'ruta':<11} {'tiempo (s)':>11} {'llamadas':>9} {'tokens prompt':>14} "
+          f"{'ROUGE-1 vs completo':>20} {'ROUGE-1 vs histórico':>21}")
+    for video_id, entry in entries:
+        full, full_time, full_calls, full_tokens = run(recap, entry["transcription"], None)
+        short, short_time, short_calls, short_tokens = run(recap, entry["transcription"], args.budget)
+        print(f"{video_id:<12} {'completo':<11} {full_time:>11.1f} {full_calls:>9} {full_tokens:>14} "
+              f"{1.0:>20.2f} {rouge1(full, entry['summary_long']):>21.2f}")
+        print(f"{video_id:<12} {'extractivo':<11} {short_time:>11.1f} {short_calls:>9} {short_tokens:>14} "
+              f"{rouge1(short, full):>20.2f} {rouge1(short, entry['summary_long']):>21.2f}")
+
+
+if __name__ == "__main__":
+    main()
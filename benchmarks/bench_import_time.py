@@ -0,0 +1,73 @@
+# Mide lo que cuesta importar summarize.py (python -X importtime) en el árbol actual y, si se
+# indica, en otra revisión de git, para comparar el arranque antes y después de los imports perezosos
+#
+# Uso: python benchmarks/bench_import_time.py [revisión]
+
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("torch", "torchaudio", "whisper", "faster_whisper", "librosa", "moviepy", "av",
+         "streamlink", "numpy", "ollama", "openai")
+# Imprime el pico de RSS después del import, en MB
+CODE = "import resource, summarize; print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)"
+
+
+def measure(directory):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", CODE],
+                            cwd=directory, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(result.stderr.splitlines()[-1] if result.stderr else "error al importar summarize")
+        return None
+    # Formato: "import time: <propio us> | <acumulado us> | <módulo>", con sangría según la profundidad
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.setdefault(name.strip(), int(cumulative))
+    return {
+        "seconds": modules.get("summarize", 0) / 1e6,
+        "modules": len(modules),
+        "rss_mb": float(result.stdout.strip().splitlines()[-1]),
+        "heavy": [name for name in HEAVY if name in modules],
+        "top": sorted(((us, name) for name, us in modules.items() if name != "summarize"), reverse=True)[:10],
+    }
+
+
+def checkout(revision, directory):
+    # Extraer la revisión sin tocar el árbol de trabajo
+    archive = os.path.join(directory, "tree.tar")
+    subprocess.run(["git", "archive", "-o", archive, revision], cwd=ROOT, check=True)
+    with tarfile.open(archive) as tar:
+        tar.extractall(directory)
+    os.remove(archive)
+
+
+def report(name, r):
+    print(f"{name}: {r['seconds']:.2f}s, {r['modules']} módulos, RSS {r['rss_mb']:.0f} MB")
+    print(f"  pesados cargados: {', '.join(r['heavy']) or 'ninguno'}")
+    for us, module in r["top"]:
+        print(f"  {us / 1000:>9.1f} ms  {module}")
+
+
+def main():
+    results = {"actual": measure(ROOT)}
+    if len(sys.argv) > 1:
+        with tempfile.TemporaryDirectory() as directory:
+            checkout(sys.argv[1], directory)
+            results[sys.argv[1]] = measure(directory)
+    for name, r in results.items():
+        if r is not None:
+            report(name, r)
+    if len(results) == 2 and all(results.values()):
+        before, after = results[sys.argv[1]], results["actual"]
+        print(f"Arranque {before['seconds']:.2f}s -> {after['seconds']:.2f}s, "
+              f"RSS {before['rss_mb']:.0f} -> {after['rss_mb']:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# Mide cuánto texto, cuántos trozos y cuántas llamadas al LLM ahorra repetition.collapse_segments
+# sobre las transcripciones de history.json
+#
+# Uso: python benchmarks/bench_repetition.py [history.json] [modelo]
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_chunker import llm_calls
+from chunker import chunk_segments, segments_from_text
+from repetition import collapse_segments, reduction
+
+
+def main():
+    history_path = sys.argv[1] if len(sys.argv) > 1 else 'history.json'
+    model = sys.argv[2] if len(sys.argv) > 2 else 'llama3.3:70b'
+    with open(history_path, 'r') as f:
+        history = json.load(f)
+
+    totals = {"chars": [0, 0], "chunks": [0, 0], "calls": [0, 0]}
+    worst = []
+    elapsed = 0.0
+    for video_id, entry in history["historic"].items():
+        if not entry["transcription"]:
+            continue
+        segments = segments_from_text(entry["transcription"])
+        start = time.monotonic()
+        cleaned = collapse_segments(segments)
+        elapsed += time.monotonic() - start
+        for i, segs in enumerate((segments, cleaned)):
+            chunks = chunk_segments(segs, model)
+            totals["chars"][i] += sum(len(segment["text"]) for segment in segs)
+            totals["chunks"][i] += len(chunks)
+            totals["calls"][i] += llm_calls(chunks)
+        worst.append((reduction(segments, cleaned), video_id))
+
+    print(f"{'':<10} {'antes':>10} {'después':>10} {'ahorro':>8}")
+    for name, (before, after) in totals.items():
+        print(f"{name:<10} {before:>10} {after:>10} {1 - after / before:>8.1%}")
+    print(f"Tiempo de limpieza: {elapsed * 1000:.0f} ms para {len(worst)} transcripciones")
+    print("Transcripciones con más repetición:")
+    for ratio, video_id in sorted(worst, reverse=True)[:5]:
+        print(f"  {video_id}: {ratio:.1%}")
+
+
+if __name__ == "__main__":
+    main()
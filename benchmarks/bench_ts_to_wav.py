@@ -0,0 +1,47 @@
+# Compara la conversión original frame a frame (Recap.ts_to_wav_by_frame) con
+# audio_stream.ts_to_wav_chunked sobre el mismo .ts
+#
+# Uso: python benchmarks/bench_ts_to_wav.py twitch_audio.wav.ts
+
+import os
+import resource
+import sys
+import time
+from multiprocessing import Process, Queue
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _run(name, ts_path, wav_path, results):
+    # Cada conversión en su propio proceso para medir su pico de memoria por separado
+    if name == "ts_to_wav_by_frame":
+        from summarize import Recap
+        convert = Recap(None, None).ts_to_wav_by_frame
+    else:
+        from audio_stream import ts_to_wav_chunked as convert
+    start = time.monotonic()
+    convert(ts_path, wav_path)
+    elapsed = time.monotonic() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    results.put((name, elapsed, peak_rss, os.path.getsize(wav_path)))
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("Uso: python benchmarks/bench_ts_to_wav.py fichero.ts")
+        sys.exit(1)
+    ts_path = sys.argv[1]
+    results = Queue()
+    print(f"{'conversor':<20} {'tiempo (s)':>11} {'RSS pico (MB)':>14} {'WAV (MB)':>9}")
+    for name in ("ts_to_wav_by_frame", "ts_to_wav_chunked"):
+        wav_path = f"bench_{name}.wav"
+        process = Process(target=_run, args=(name, ts_path, wav_path, results))
+        process.start()
+        process.join()
+        _, elapsed, peak_rss, size = results.get()
+        print(f"{name:<20} {elapsed:>11.1f} {peak_rss:>14.0f} {size / (1024 * 1024):>9.1f}")
+        os.remove(wav_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# Comprueba la reanudación y la reparación de SegmentDownloader contra un servidor HTTP local:
+# corta una descarga a medias, corrompe segmentos y trunca el fichero, y verifica que cada
+# reanudación deja un fichero idéntico byte a byte al de una descarga completa
+#
+# Uso: python benchmarks/check_segment_resume.py
+
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from segment_downloader import SegmentDownloader, load_manifest
+
+SEGMENTS = 80
+SOURCE = "https://www.twitch.tv/videos/test"
+
+
+class Server:
+    """Sirve una playlist de SEGMENTS segmentos; los de fail devuelven 404."""
+
+    def __init__(self):
+        rng = random.Random(1)
+        self.segments = {f"{i}.ts": rng.randbytes(rng.randint(1000, 5000)) for i in range(SEGMENTS)}
+        self.fail = set()
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                name = self.path.lstrip("/")
+                server.requests.append(name)
+                if name == "index.m3u8":
+                    body = ("#EXTM3U\n" + "".join(f"#EXTINF:2.0,\n{i}.ts\n" for i in range(SEGMENTS))).encode()
+                elif name in server.segments and name not in server.fail:
+                    body = server.segments[name]
+                else:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/index.m3u8"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def expected(self):
+        return b"".join(self.segments[f"{i}.ts"] for i in range(SEGMENTS))
+
+    def fetched(self):
+        fetched = [name for name in self.requests if name.endswith(".ts")]
+        self.requests.clear()
+        return fetched
+
+
+def corrupt(path, manifest_path, index):
+    entry = load_manifest(manifest_path, SOURCE)["segments"][f"{index}.ts"]
+    with open(path, "r+b") as f:
+        f.seek(entry["offset"] + entry["size"] // 2)
+        f.write(b"\x00" * 16)
+
+
+def main():
+    server = Server()
+    downloader = SegmentDownloader(max_workers=4, retries=0)
+    failures = []
+
+    def check(name, path, fetched, expected_fetched=None):
+        with open(path, "rb") as f:
+            identical = f.read() == server.expected()
+        ok = identical and (expected_fetched is None or sorted(fetched) == sorted(expected_fetched))
+        print(f"{'OK   ' if ok else 'FALLO'} {name}: {len(fetched)} segmentos pedidos, "
+              f"fichero {'idéntico' if identical else 'DISTINTO'}")
+        if not ok:
+            failures.append(name)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "audio.ts")
+        manifest_path = path + ".manifest.json"
+
+        # 1. Descarga cortada: el segmento 60 falla y el manifiesto guarda todo lo escrito antes
+        server.fail = {"60.ts"}
+        try:
+            downloader.download(server.url, path, manifest_path=manifest_path, source=SOURCE)
+            failures.append("la descarga cortada no falló")
+        except Exception as e:
+            print(f"Descarga interrumpida como se esperaba: {e.__class__.__name__}")
+        server.fetched()
+        saved = len(load_manifest(manifest_path, SOURCE)["segments"])
+        print(f"{'OK   ' if saved == 60 else 'FALLO'} manifiesto tras el corte: {saved} segmentos guardados")
+        if saved != 60:
+            failures.append("manifiesto tras el corte")
+        server.fail = set()
+
+        # 2. Reanudar: solo se piden los segmentos que faltan de verdad, del 60 en adelante
+        downloader.download(server.url, path, manifest_path=manifest_path, source=SOURCE)
+        check("reanudar tras el corte", path, server.fetched(), [f"{i}.ts" for i in range(60, SEGMENTS)])
+
+        # 3. Segmentos corruptos del mismo tamaño: se reparan en su sitio, sin pedir nada más
+        corrupt(path, manifest_path, 5)
+        corrupt(path, manifest_path, 42)
+        downloader.download(server.url, path, manifest_path=manifest_path, source=SOURCE)
+        check("reparar corruptos en su sitio", path, server.fetched(), ["5.ts", "42.ts"])
+
+        # 4. Segmento corrupto que al volver a pedirlo tiene otro tamaño: se reescribe desde él
+        corrupt(path, manifest_path, 30)
+        server.segments["30.ts"] = server.segments["30.ts"] + b"extra"
+        downloader.download(server.url, path, manifest_path=manifest_path, source=SOURCE)
+        check("corrupto con otro tamaño", path, server.fetched(), [f"{i}.ts" for i in range(30, SEGMENTS)])
+
+        # 5. Fichero truncado por detrás del manifiesto: se continúa desde el último segmento entero
+        entry = load_manifest(manifest_path, SOURCE)["segments"]["70.ts"]
+        with open(path, "r+b") as f:
+            f.truncate(entry["offset"] + entry["size"] // 2)
+        downloader.download(server.url, path, manifest_path=manifest_path, source=SOURCE)
+        check("fichero truncado", path, server.fetched(), [f"{i}.ts" for i in range(70, SEGMENTS)])
+
+        # 6. Manifiesto de otro vídeo: se descarga todo de nuevo
+        downloader.download(server.url, path, manifest_path=manifest_path, source=SOURCE + "-otro")
+        check("manifiesto de otro vídeo", path, server.fetched(), [f"{i}.ts" for i in range(SEGMENTS)])
+
+        digest = hashlib.sha256(server.expected()).hexdigest()[:12]
+        print(f"{SEGMENTS} segmentos, {len(server.expected())} bytes (sha256 {digest}...)")
+
+    server.httpd.shutdown()
+    if failures:
+        print(f"{len(failures)} comprobaciones fallidas: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
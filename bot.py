@@ -4,13 +4,14 @@ import os
 import asyncio
 import sys
 import time
-import requests
 import json
 import aiohttp
 import bs4
 import random
+import statistics
+from collections import deque
 from openai import OpenAI
-from ollama import Client
+from ollama import AsyncClient
 from twitchio.ext import commands
 from watchdog.observers import Observer
 
@@ -18,18 +19,28 @@ from dotenv import load_dotenv
 from signal_handlers import setup_signal_handlers
 
 from watcher import SRTDirectoryHandler
+from conversation_memory import ConversationMemory
+from request_coalescer import RequestCoalescer
+from chat_rate_limiter import PRIORITY_CHAT, PRIORITY_COMMAND, ChatScheduler
+from chat_summary import CHAT_LIMIT, SummaryCache, split_message
+from helix import get_client as get_helix_client
 
 load_dotenv()
 model = "llama4:scout" #"llama3.3:70b"
+# Peticiones al LLM a la vez por canal; el resto esperan turno sin bloquear el bucle de eventos
+LLM_CONCURRENCY = int(os.getenv('BOT_LLM_CONCURRENCY', '1'))
+# Tokens de conversación que se mandan al LLM y turnos recientes que nunca se resumen
+MEMORY_TOKENS = int(os.getenv('BOT_MEMORY_TOKENS', '4000'))
+MEMORY_RECENT = int(os.getenv('BOT_MEMORY_RECENT', '10'))
+# Las peticiones a Verónica separadas menos de COALESCE_WINDOW segundos se contestan juntas
+# y las que llevan más de COALESCE_DEADLINE segundos en cola se descartan
+COALESCE_WINDOW = float(os.getenv('BOT_COALESCE_WINDOW', '3'))
+COALESCE_DEADLINE = float(os.getenv('BOT_COALESCE_DEADLINE', '30'))
 
 def get_token():
-    params = {
-        'client_id': os.getenv('TWITCH_CLIENT_ID'),
-        'client_secret': os.getenv('TWITCH_CLIENT_SECRET'),
-        'grant_type': 'client_credentials'
-    }
-    response = requests.post('https://id.twitch.tv/oauth2/token', params=params)
-    token = response.json()['access_token']
+    # El token de aplicación se comparte y se reutiliza hasta que caduca
+    helix = get_helix_client(os.getenv('TWITCH_CLIENT_ID'), os.getenv('TWITCH_CLIENT_SECRET'))
+    token = helix.get_token()
     print(f"Token: {token}")
     return token
 
@@ -39,9 +50,13 @@ class Bot(commands.Bot):
     def __init__(self):
         self.token = os.getenv('BOT_ACCESS_TOKEN')
         #self.llm_client = OpenAI(base_url="http://localhost:1234/v1", api_key="lm-studio")
-        self.llm_client = Client(host=os.getenv('OLLAMA_HOST'))
+        # Cliente asíncrono: mientras se genera una respuesta el bot sigue leyendo el chat
+        self.llm_client = AsyncClient(host=os.getenv('OLLAMA_HOST'))
+        self.llm_semaphores = {}
+        self.llm_latencies = {}
         self.channels = ['drpalanca'] #, "MarshallFlashMusic".lower(), 'tato_escriche', 'disten_', "jurgen_ator", "tiavioligaming", "outatime_videogames"]
-        self.messages={}
+        self.messages = ConversationMemory(self.summarize_conversation, model,
+                                           budget=MEMORY_TOKENS, keep_recent=MEMORY_RECENT)
         self.reduce = "Resume el siguiente texto a 200 caracteres: "
         self.role =  """Eres una asistente llamada Verónica del canal de Twitch del {0}.
                 Eres una planta de plástico que ha cobrado vida y te dedicas a ayudar a los espectadores.
@@ -56,13 +71,20 @@ class Bot(commands.Bot):
                 Te centras en contestar la última pregunta que te han hecho, mirando quien es el autor.
                 Te habla mucha gente, pero los identificas porque primero dicen su nombre antes de dos puntos.
                 Añades al final de todos tus mensajes un hashtag cachondo relacionado con el contenido de la conversación."""
+        self.veronica_queue = RequestCoalescer(self.answer, window=COALESCE_WINDOW, deadline=COALESCE_DEADLINE)
         for channel in self.channels:
-            self.messages[channel] = [{"role": "system", "content":self.role.format(channel)}]
+            self.messages.add_channel(channel, self.role.format(channel))
         super().__init__(token=os.getenv("OAUTH_TOKEN"),
                          client_id=os.getenv("BOT_CLIENT_ID"),
                          prefix='!', initial_channels=self.channels)
         self.message_count = 0
-        self.message_timestamps = []
+        # Todos los mensajes de salida pasan por el planificador, que respeta los límites de Twitch.
+        # En los canales de BOT_MOD_CHANNELS el bot es moderador y tiene más margen.
+        self.chat_scheduler = ChatScheduler(moderator_channels=os.getenv('BOT_MOD_CHANNELS', '').split(','))
+        # Trozos de summary.txt listos para el chat; se refrescan solos cuando cambia el fichero
+        self.summary_cache = SummaryCache('summary.txt', 'summary_chat.json',
+                                          shorten=lambda text: self.shorten(text, "resumen"))
+        self.summary_watcher = None
         
         # Configurar manejadores de señales para reiniciar la memoria
         setup_signal_handlers(self)
@@ -75,27 +97,24 @@ class Bot(commands.Bot):
     async def event_ready(self):
         # We are logged in and ready to chat and use commands...
         print(f'Logged in')
+        if self.summary_watcher is None:
+            self.summary_watcher = asyncio.create_task(self.summary_cache.watch())
 
-    async def summarize_conversation(self, channel):
-        """Resumir la conversación actual y actualizar messages."""
-        conversation = " ".join([msg["content"] for msg in self.messages[channel]])
+    async def summarize_conversation(self, channel, conversation):
+        """Resumir los turnos más antiguos de la conversación (lo llama la memoria en segundo plano)."""
         prompt = self.reduce + conversation
-        messages = [{"role": "system", "content": "Eres un asistente de resumenes. Resumes conversaciones sin introducir ruido adicional."}]
-        response = self.get_llm_conversation(prompt, channel, messages=messages)
-        self.messages[channel] = [
-            {"role": "system", "content": self.role.format(channel), 
-             "role": "user", "content": response}
-            ]
+        messages = [{"role": "system", "content": "Eres un asistente de resumenes. Resumes conversaciones sin introducir ruido adicional."},
+                    {"role": "user", "content": prompt}]
+        # Cola propia para los resúmenes de memoria: un !veronica nunca espera a que termine uno
+        response = await self.chat(f"{channel}:memoria", "resumen de memoria", messages)
         print(f"Resumen de la conversación: {response}")
+        return response
 
     async def add_message(self, channel, message):
-        """Añadir un mensaje a la conversación, resumiendo si es necesario."""
+        """Añadir un mensaje a la conversación; si pasa del presupuesto, se resume en segundo plano."""
         print(f"Añadiendo mensaje a la conversación de {channel}")
-        #if len(self.messages[channel]) > 25:  # Suponiendo un límite de 50 mensajes
-        #    print("Resumiendo conversación...")
-        #    await self.summarize_conversation(channel)
         try:
-            self.messages[channel].append(message)
+            self.messages.add(channel, message)
         except Exception as e:
             print(f"Error al añadir mensaje: {e}")
             print(f"Channel: <{channel}>")
@@ -110,66 +129,51 @@ class Bot(commands.Bot):
             await self.add_message(ctx.channel.name, message)
 
             if not ctx.content.startswith("!"):
-                if random.random() < 0.15: # and len(self.message_timestamps) < 5:
+                if random.random() < 0.15:
                     print("Invocando a Verónica...")
-                    current_time = time.time()
-                    self.message_timestamps = [timestamp for timestamp in self.message_timestamps if current_time - timestamp < 60]
                     ctx.content = f"!veronica {ctx.content}"
-                    self.message_timestamps.append(time.time())
             # No olvides de procesar los comandos
             await bot.handle_commands(ctx)
 
-    async def send(self, message, ctx):
+    async def shorten(self, message, channel):
+        messages = [
+            {"role": "system", "content": "Eres el bot Veronica que se dedica únicamente a resumir, sin introducir ruido adicional, los mensajes, por lo que no cambias nunca ni los tiempos verbales ni las personas."},
+            {"role": "user", "content": self.reduce + message}
+            ]
+        return await self.chat(channel, "acortar", messages)
+
+    async def send(self, message, ctx, priority=PRIORITY_CHAT):
         # Enviar mensaje al chat en varias partes, respetando las reglas de Twitch
-        #dividir el mensaje en chunks de 400 caracteres
-        if len(message) > 400:
-            messages = [
-                {"role": "system", "content": "Eres el bot Veronica que se dedica únicamente a resumir, sin introducir ruido adicional, los mensajes, por lo que no cambias nunca ni los tiempos verbales ni las personas."},
-                {"role": "user", "content": self.reduce + message}
-                ]
-            #response = self.llm_client.chat.completions.create(
-            response = self.llm_client.chat(
-                model=model,
-                messages=messages,
-                #temperature=0.4,
-            )
-            #message = response.choices[0].message.content
-            message = response["message"]["content"]
-        
+        if len(message) > CHAT_LIMIT:
+            message = await self.shorten(message, ctx.channel.name)
+        # Dividir el mensaje en chunks de 400 caracteres sin cortar palabras a la mitad
+        await self.send_chunks(split_message(message), ctx, priority)
+
+    async def send_chunks(self, chunks, ctx, priority=PRIORITY_CHAT):
         try:
-            # Dividir el mensaje en chunks de 400 caracteres sin cortar palabras a la mitad
-            words = message.split()
-            chunks = []
-            chunk = ""
-            for word in words:
-                if len(chunk) + len(word) + 1 > 400:
-                    chunks.append(chunk)
-                    chunk = word
-                else:
-                    chunk += " " + word if chunk else word
-            chunks.append(chunk)  # Añadir el último chunk
-
-            for chunk in chunks:
-                await ctx.send(chunk)
-                await asyncio.sleep(1)
+            # Los trozos salen tan rápido como permiten los límites de Twitch, en orden
+            await self.chat_scheduler.send(ctx.channel.name, ctx.send, chunks, priority)
         except Exception as e:
             print(f"Error al enviar mensaje: {e}")
 
     @commands.command()
     async def resumen(self, ctx: commands.Context):
         print("Comando !resumen recibido")
-        with open('summary.txt', 'r') as file:
-            summary = file.read()
-
-        await self.send(summary, ctx)
+        # Trozos ya preparados: sin leer summary.txt ni llamar al LLM salvo que el fichero haya cambiado
+        chunks = await self.summary_cache.get()
+        await self.send_chunks(chunks, ctx, priority=PRIORITY_COMMAND)
 
     @commands.command()
     async def veronica(self, ctx: commands.Context):
         print("Comando !veronica recibido")
+        # Las ráfagas de peticiones del mismo canal se contestan con una sola respuesta
+        self.veronica_queue.submit(ctx.channel.name, ctx)
+
+    async def answer(self, ctx: commands.Context):
         #title, game = self.get_twitch_title_and_game("DrPalanca")
         #print("Título del stream: ", title, "Juego: ", game)
         msg = f"{ctx.author.name}: {ctx.message.content}"
-        response = self.get_llm_conversation(msg, ctx.channel.name)
+        response = await self.get_llm_conversation(msg, ctx.channel.name)
         print("Respuesta de Verónica: ", response)
         await self.add_message(ctx.channel.name, {"role": "assistant", "content": response})
         await self.send(response, ctx)
@@ -179,16 +183,38 @@ class Bot(commands.Bot):
         return await self.veronica(ctx)
     
 
-    def get_llm_conversation(self, text, channel, messages=None):
-        #response = self.llm_client.chat.completions.create(
-        response = self.llm_client.chat(
-            #model="Qwen/Qwen2-7B-Instruct-GGUF",
-            model=model,
-            messages=messages if messages is not None else self.messages[channel],
-            #temperature=0.7,
-            )
-        #text = response.choices[0].message.content
-        text = response["message"]["content"]
+    async def chat(self, channel, label, messages):
+        """Llama al LLM sin bloquear el bucle de eventos y guarda la latencia de la petición.
+
+        Cada canal tiene su propio límite de peticiones a la vez, así que una respuesta lenta
+        en un canal no retrasa a los demás.
+        """
+        if channel not in self.llm_semaphores:
+            self.llm_semaphores[channel] = asyncio.Semaphore(LLM_CONCURRENCY)
+            self.llm_latencies[channel] = deque(maxlen=100)
+        # Copia de la conversación tal y como está ahora, aunque siga llegando chat mientras espera
+        messages = list(messages)
+        queued = time.monotonic()
+        async with self.llm_semaphores[channel]:
+            start = time.monotonic()
+            #response = self.llm_client.chat.completions.create(
+            response = await self.llm_client.chat(
+                #model="Qwen/Qwen2-7B-Instruct-GGUF",
+                model=model,
+                messages=messages,
+                #temperature=0.7,
+                )
+        elapsed = time.monotonic() - start
+        latencies = self.llm_latencies[channel]
+        latencies.append(elapsed)
+        print(f"[LLM][{channel}] {label}: {elapsed:.1f}s (en cola {start - queued:.1f}s, "
+              f"mediana {statistics.median(latencies):.1f}s en {len(latencies)} peticiones)")
+        #return response.choices[0].message.content
+        return response["message"]["content"]
+
+    async def get_llm_conversation(self, text, channel, messages=None):
+        text = await self.chat(channel, "conversación",
+                               messages if messages is not None else self.messages[channel])
         if "<|eot_id|>" in text:
             text, _ = text.split("<|eot_id|>", 1)
         if text.startswith("Verónica:") or text.startswith("Veronica:"):
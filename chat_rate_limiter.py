@@ -0,0 +1,147 @@
+# Planificador de mensajes de salida al chat de Twitch, respetando sus límites de envío
+#
+# Twitch permite 20 mensajes cada 30 segundos a una cuenta normal y 100 si es moderadora o
+# dueña del canal al que escribe, y en los canales donde no es moderadora exige además un
+# segundo entre mensajes. Los límites globales se llevan con ventanas deslizantes (deque de
+# instantes de envío) y los de cada canal con token buckets. Los mensajes salen en cuanto los
+# límites lo permiten, los de prioridad alta (respuestas a comandos) antes que el resto y,
+# dentro de un canal y prioridad, siempre en orden.
+
+import asyncio
+import time
+from collections import deque
+
+PRIORITY_COMMAND = 0
+PRIORITY_CHAT = 1
+
+WINDOW_SECONDS = 30
+REGULAR_LIMIT = 20
+MODERATOR_LIMIT = 100
+# Segundos entre mensajes en los canales donde no somos moderadores
+CHANNEL_INTERVAL = 1.1
+# Margen para que las diferencias de reloj con el servidor no nos hagan pasar del límite
+MARGIN = 0.5
+
+
+class TokenBucket:
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+
+class SlidingWindow:
+    def __init__(self, limit, period):
+        self.limit = limit
+        self.period = period
+        self.sent = deque()
+
+    def wait_time(self, now):
+        while self.sent and now - self.sent[0] >= self.period:
+            self.sent.popleft()
+        return 0.0 if len(self.sent) < self.limit else self.sent[0] + self.period - now
+
+    def add(self, now):
+        self.sent.append(now)
+
+
+class ChatScheduler:
+    def __init__(self, moderator_channels=()):
+        self.moderator_channels = {channel.lower() for channel in moderator_channels if channel}
+        period = WINDOW_SECONDS + MARGIN
+        # Todos los mensajes cuentan para el límite de moderador; los de canales donde no lo somos,
+        # también para el de cuenta normal
+        self.global_all = SlidingWindow(MODERATOR_LIMIT, period)
+        self.global_regular = SlidingWindow(REGULAR_LIMIT, period)
+        self.buckets = {}
+        self.lanes = {PRIORITY_COMMAND: deque(), PRIORITY_CHAT: deque()}
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.sent = 0
+
+    def is_moderator(self, channel):
+        return channel.lower() in self.moderator_channels
+
+    def bucket(self, channel):
+        if channel not in self.buckets:
+            if self.is_moderator(channel):
+                self.buckets[channel] = TokenBucket(MODERATOR_LIMIT, MODERATOR_LIMIT / (WINDOW_SECONDS + MARGIN))
+            else:
+                self.buckets[channel] = TokenBucket(1, 1 / CHANNEL_INTERVAL)
+        return self.buckets[channel]
+
+    def enqueue(self, channel, send, text, priority=PRIORITY_CHAT):
+        """Encola text para el canal; send es la corrutina que lo escribe. Devuelve un future."""
+        future = asyncio.get_running_loop().create_future()
+        self.lanes[priority].append((channel, send, text, future))
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+        self.wakeup.set()
+        return future
+
+    async def send(self, channel, send, chunks, priority=PRIORITY_CHAT):
+        """Envía los trozos en orden y espera a que hayan salido todos."""
+        futures = [self.enqueue(channel, send, chunk, priority) for chunk in chunks]
+        for result in await asyncio.gather(*futures, return_exceptions=True):
+            if isinstance(result, Exception):
+                raise result
+
+    def _wait_time(self, channel, now):
+        wait = max(self.bucket(channel).wait_time(now), self.global_all.wait_time(now))
+        if not self.is_moderator(channel):
+            wait = max(wait, self.global_regular.wait_time(now))
+        return wait
+
+    def _next(self, now):
+        """Primer mensaje que se puede enviar ya, o el tiempo hasta que alguno se pueda enviar."""
+        shortest = None
+        blocked = set()
+        for priority in sorted(self.lanes):
+            lane = self.lanes[priority]
+            for index, (channel, _, _, _) in enumerate(lane):
+                # Un canal ocupado en una prioridad más alta, o con un mensaje anterior pendiente, espera
+                if channel in blocked:
+                    continue
+                blocked.add(channel)
+                wait = self._wait_time(channel, now)
+                if wait <= 0:
+                    return lane, index, 0.0
+                shortest = wait if shortest is None else min(shortest, wait)
+        return None, None, shortest
+
+    async def _run(self):
+        while any(self.lanes.values()):
+            self.wakeup.clear()
+            now = time.monotonic()
+            lane, index, wait = self._next(now)
+            if lane is None:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            channel, send, text, future = lane[index]
+            del lane[index]
+            self.bucket(channel).take(now)
+            self.global_all.add(now)
+            if not self.is_moderator(channel):
+                self.global_regular.add(now)
+            try:
+                await send(text)
+                self.sent += 1
+                future.set_result(None)
+            except Exception as e:
+                future.set_exception(e)
@@ -0,0 +1,115 @@
+# Versión para el chat del resumen del último directo (summary.txt)
+#
+# La etapa publish escribe junto a summary.txt un summary_chat.json con el resumen ya
+# troceado en mensajes de chat y el sha256 del summary.txt al que corresponde. El bot guarda
+# esos trozos en memoria (SummaryCache), así que !resumen contesta sin leer disco ni llamar al LLM.
+
+import asyncio
+import hashlib
+import json
+import os
+
+CHAT_LIMIT = 400
+NO_SUMMARY = "Todavía no hay resumen del último directo."
+
+
+def split_message(message, limit=CHAT_LIMIT):
+    """Divide el mensaje en trozos de como mucho limit caracteres sin cortar palabras a la mitad."""
+    chunks = []
+    chunk = ""
+    for word in message.split():
+        if chunk and len(chunk) + len(word) + 1 > limit:
+            chunks.append(chunk)
+            chunk = word
+        else:
+            chunk += " " + word if chunk else word
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def summary_text(summary_short, url):
+    return f"{summary_short}\n\n Resumen completo: {url}"
+
+
+def chat_chunks(summary_short, url):
+    # El enlace va en su propio mensaje si no cabe con el final del resumen, para que nunca se corte
+    chunks = split_message(summary_short)
+    link = f"Resumen completo: {url}"
+    if chunks and len(chunks[-1]) + len(link) + 1 <= CHAT_LIMIT:
+        chunks[-1] += " " + link
+    else:
+        chunks.append(link)
+    return chunks
+
+
+def digest(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class SummaryCache:
+    """Trozos de chat de summary.txt, indexados por su mtime y el hash de su contenido.
+
+    Si summary.txt no tiene summary_chat.json al día (por ejemplo, si se ha editado a mano),
+    se acorta con shorten, una corrutina shorten(text) que llama al LLM, como hacía antes el bot.
+    """
+
+    def __init__(self, path='summary.txt', chat_path='summary_chat.json', shorten=None):
+        self.path = path
+        self.chat_path = chat_path
+        self.shorten = shorten
+        self.mtime = None
+        self.sha256 = None
+        self.chunks = None
+        self.lock = asyncio.Lock()
+
+    def _load_chat(self, sha256):
+        try:
+            with open(self.chat_path, 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return data["chunks"] if data.get("sha256") == sha256 else None
+
+    async def refresh(self):
+        async with self.lock:
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime == self.mtime:
+                return
+            with open(self.path, 'r') as f:
+                text = f.read()
+            sha256 = digest(text)
+            if sha256 != self.sha256:
+                chunks = self._load_chat(sha256)
+                if chunks is None:
+                    if len(text) > CHAT_LIMIT and self.shorten is not None:
+                        text = await self.shorten(text)
+                    chunks = split_message(text)
+                if not chunks:
+                    # No se guarda en caché un resumen vacío: se vuelve a leer en la próxima consulta
+                    print(f"{self.path} está vacío, no hay resumen para el chat")
+                    return
+                self.chunks = chunks
+                self.sha256 = sha256
+                print(f"Resumen para el chat actualizado: {len(chunks)} mensajes")
+            self.mtime = mtime
+
+    async def get(self):
+        """Trozos para el chat; si no hay resumen todavía, un único mensaje avisándolo."""
+        try:
+            if self.chunks is None or os.stat(self.path).st_mtime_ns != self.mtime:
+                await self.refresh()
+        except FileNotFoundError:
+            pass
+        return self.chunks or [NO_SUMMARY]
+
+    async def watch(self, interval=10):
+        """Refresca en segundo plano cuando cambia summary.txt, para tenerlo listo antes del !resumen."""
+        while True:
+            try:
+                await self.refresh()
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"Error al actualizar el resumen para el chat: {e}")
+            await asyncio.sleep(interval)
@@ -0,0 +1,118 @@
+# Troceado de transcripciones por segmentos de Whisper, ajustado al contexto del modelo
+
+import math
+import os
+import re
+
+# Tokens por palabra en español, aproximados, según la familia del tokenizador
+TOKENS_PER_WORD = {
+    "llama3": 1.35,
+    "llama4": 1.3,
+    "qwen": 1.45,
+    "gemma": 1.3,
+    "mistral": 1.7,
+    "llama2": 1.75,
+}
+DEFAULT_TOKENS_PER_WORD = 1.5
+
+# Tokens que ocupan las instrucciones de _summarize y los que se reservan para la respuesta
+PROMPT_TOKENS = 600
+RESPONSE_TOKENS = 1024
+
+WORD_RE = re.compile(r"\w+")
+PUNCT_RE = re.compile(r"[^\w\s]")
+SENTENCE_RE = re.compile(r"(?<=[.!?¿¡…])\s+")
+
+
+def get_num_ctx():
+    # Ollama trunca en silencio los prompts que no caben en num_ctx, así que se fija siempre
+    return int(os.getenv('OLLAMA_NUM_CTX', '16384'))
+
+
+def tokens_per_word(model):
+    family = model.split(":")[0].lower()
+    for prefix, ratio in TOKENS_PER_WORD.items():
+        if family.startswith(prefix):
+            return ratio
+    return DEFAULT_TOKENS_PER_WORD
+
+
+def estimate_tokens(text, model):
+    """Estimación rápida de tokens: palabras por el ratio del modelo más un token por signo."""
+    words = len(WORD_RE.findall(text))
+    punct = len(PUNCT_RE.findall(text))
+    return math.ceil(words * tokens_per_word(model)) + punct
+
+
+def chunk_budget(model, num_ctx=None):
+    return (num_ctx or get_num_ctx()) - PROMPT_TOKENS - RESPONSE_TOKENS
+
+
+def segments_from_text(text):
+    """Crea pseudo-segmentos por frases para cuando solo se tiene el texto (por ejemplo, history.json)."""
+    return [{"text": " " + sentence} for sentence in SENTENCE_RE.split(text) if sentence.strip()]
+
+
+def _split_long(text, budget, model):
+    # Un segmento que no cabe solo se corta por palabras. Se llevan la cuenta de palabras y
+    # de signos del trozo, así que su estimación es la misma que la de estimate_tokens
+    ratio = tokens_per_word(model)
+    parts = []
+    for word in text.split():
+        if estimate_tokens(word, model) > budget:
+            # Una "palabra" que no cabe sola (una URL enorme, una ristra de signos) se corta por caracteres
+            step = max(1, budget // 2)
+            parts.extend(word[i:i + step] for i in range(0, len(word), step))
+        else:
+            parts.append(word)
+
+    pieces = []
+    piece, words, punct = [], 0, 0
+    for part in parts:
+        part_words = len(WORD_RE.findall(part))
+        part_punct = len(PUNCT_RE.findall(part))
+        if piece and math.ceil((words + part_words) * ratio) + punct + part_punct > budget:
+            pieces.append(" " + " ".join(piece))
+            piece, words, punct = [], 0, 0
+        piece.append(part)
+        words += part_words
+        punct += part_punct
+    if piece:
+        pieces.append(" " + " ".join(piece))
+    return pieces
+
+
+def chunk_segments(segments, model, budget=None, overlap=200):
+    """Agrupa los segmentos en trozos de como mucho budget tokens estimados.
+
+    Los cortes caen siempre entre segmentos y cada trozo repite al principio los
+    últimos segmentos del anterior, hasta overlap tokens, para no perder contexto.
+    """
+    budget = budget or chunk_budget(model)
+    pieces = []
+    for segment in segments:
+        text = segment["text"]
+        tokens = estimate_tokens(text, model)
+        if tokens > budget:
+            pieces.extend((piece, estimate_tokens(piece, model)) for piece in _split_long(text, budget, model))
+        else:
+            pieces.append((text, tokens))
+
+    chunks = []
+    current, current_tokens = [], 0
+    for text, tokens in pieces:
+        if current and current_tokens + tokens > budget:
+            chunks.append("".join(piece for piece, _ in current).strip())
+            # Arrastrar el final del trozo anterior como solape
+            carried, carried_tokens = [], 0
+            for piece in reversed(current):
+                if carried_tokens + piece[1] > overlap or carried_tokens + piece[1] + tokens > budget:
+                    break
+                carried.insert(0, piece)
+                carried_tokens += piece[1]
+            current, current_tokens = carried, carried_tokens
+        current.append((text, tokens))
+        current_tokens += tokens
+    if current:
+        chunks.append("".join(piece for piece, _ in current).strip())
+    return chunks
@@ -0,0 +1,104 @@
+# Memoria de la conversación del bot por canal, con un presupuesto de tokens
+#
+# El prompt de sistema y los últimos turnos se guardan tal cual. Cuando la conversación pasa
+# del presupuesto, los turnos más antiguos se resumen en segundo plano y se sustituyen por ese
+# resumen, así que el prompt (y la latencia de cada respuesta) deja de crecer con el directo.
+
+import asyncio
+import time
+
+from chunker import estimate_tokens
+
+
+class ChannelMemory:
+    def __init__(self, system_prompt, model):
+        self.system = {"role": "system", "content": system_prompt}
+        self.system_tokens = estimate_tokens(system_prompt, model)
+        self.summary = None
+        self.summary_tokens = 0
+        self.turns = []
+        self.turn_tokens = []
+        # Resumen en curso y número de reinicios, para descartar resúmenes de una memoria ya borrada
+        self.task = None
+        self.generation = 0
+
+    def tokens(self):
+        return self.system_tokens + self.summary_tokens + sum(self.turn_tokens)
+
+
+class ConversationMemory:
+    """Conversaciones de varios canales. memory[channel] devuelve los mensajes a mandar al LLM.
+
+    summarize es una corrutina summarize(channel, text) que devuelve el resumen de text.
+    """
+
+    def __init__(self, summarize, model, budget=4000, keep_recent=10):
+        self.summarize = summarize
+        self.model = model
+        self.budget = budget
+        self.keep_recent = keep_recent
+        self.channels = {}
+
+    def add_channel(self, channel, system_prompt):
+        self.channels[channel] = ChannelMemory(system_prompt, self.model)
+
+    def __iter__(self):
+        return iter(self.channels)
+
+    def keys(self):
+        return self.channels.keys()
+
+    def __contains__(self, channel):
+        return channel in self.channels
+
+    def __getitem__(self, channel):
+        memory = self.channels[channel]
+        messages = [memory.system]
+        if memory.summary:
+            messages.append({"role": "system", "content": f"Resumen de la conversación anterior: {memory.summary}"})
+        return messages + memory.turns
+
+    def tokens(self, channel):
+        return self.channels[channel].tokens()
+
+    def add(self, channel, message):
+        memory = self.channels[channel]
+        memory.turns.append(message)
+        memory.turn_tokens.append(estimate_tokens(message["content"], self.model))
+        if (memory.tokens() > self.budget and memory.task is None
+                and len(memory.turns) > self.keep_recent):
+            memory.task = asyncio.create_task(self._compact(channel, memory))
+
+    def reset(self, channel):
+        """Olvida la conversación del canal y se queda solo con el prompt de sistema."""
+        memory = self.channels[channel]
+        memory.summary = None
+        memory.summary_tokens = 0
+        memory.turns = []
+        memory.turn_tokens = []
+        memory.generation += 1
+
+    async def _compact(self, channel, memory):
+        # Los turnos nuevos se añaden al final, así que los count primeros no cambian mientras se resume
+        count = len(memory.turns) - self.keep_recent
+        generation = memory.generation
+        old = [message["content"] for message in memory.turns[:count]]
+        text = "\n".join(old)
+        if memory.summary:
+            text = f"{memory.summary}\n{text}"
+        start = time.monotonic()
+        try:
+            summary = await self.summarize(channel, text)
+            if memory.generation != generation:
+                return
+            before = memory.tokens()
+            del memory.turns[:count]
+            del memory.turn_tokens[:count]
+            memory.summary = summary
+            memory.summary_tokens = estimate_tokens(summary, self.model)
+            print(f"Memoria de {channel}: {count} turnos resumidos en {time.monotonic() - start:.1f}s, "
+                  f"{before} -> {memory.tokens()} tokens estimados")
+        except Exception as e:
+            print(f"Error al resumir la conversación de {channel}: {e}")
+        finally:
+            memory.task = None
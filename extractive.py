@@ -0,0 +1,98 @@
+# Preselección extractiva de la transcripción (TF-IDF + TextRank) para acortar los prompts del LLM
+
+import re
+from collections import Counter
+
+import numpy as np
+
+from chunker import estimate_tokens
+
+WORD_RE = re.compile(r"\w+")
+ACCENTS = str.maketrans("áéíóúü", "aeiouu")
+
+STOPWORDS = set("""
+a al algo algun alguna algunas alguno algunos ante antes aqui asi aun bien cada como con contra cual
+cuando de del desde donde dos el ella ellas ello ellos en entre era eran es esa esas ese eso esos esta
+estaba estamos estan estar este esto estos estoy fue fueron ha hace hacer han has hasta hay he la las
+le les lo los mas me mi mis mucho muy nada ni no nos nosotros o os otra otro para pero poco por porque
+que se sea ser si sin sobre solo son su sus tambien tan tanto te tiene tienen todo todos tu un una uno
+unos va vamos voy y ya yo eh pues bueno oye vale tal
+""".split())
+
+
+def _words(text):
+    words = []
+    for word in WORD_RE.findall(text.lower()):
+        word = word.translate(ACCENTS)
+        if len(word) > 2 and word not in STOPWORDS and not word.isdigit():
+            words.append(word)
+    return words
+
+
+def make_spans(segments, span_words=60):
+    """Agrupa segmentos contiguos de Whisper en tramos de unas span_words palabras, que son las frases a puntuar."""
+    spans, current, count = [], [], 0
+    for segment in segments:
+        current.append(segment)
+        count += len(segment["text"].split())
+        if count >= span_words:
+            spans.append(current)
+            current, count = [], 0
+    if current:
+        spans.append(current)
+    return spans
+
+
+def tfidf_matrix(texts, max_terms=3000):
+    """Matriz tramos x términos con TF-IDF normalizado por filas (L2)."""
+    documents = [Counter(_words(text)) for text in texts]
+    df = Counter(term for document in documents for term in document)
+    # Quedarse con los términos más frecuentes que no aparecen en casi todos los tramos
+    limit = 0.5 * len(documents)
+    vocabulary = [term for term, count in df.most_common() if 1 < count <= limit][:max_terms]
+    index = {term: i for i, term in enumerate(vocabulary)}
+    matrix = np.zeros((len(documents), len(vocabulary)), dtype=np.float32)
+    for row, document in enumerate(documents):
+        for term, count in document.items():
+            column = index.get(term)
+            if column is not None:
+                matrix[row, column] = count
+    idf = np.log(len(documents) / np.array([df[term] for term in vocabulary], dtype=np.float32))
+    matrix = np.log1p(matrix) * idf
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-9)
+
+
+def textrank(matrix, damping=0.85, iterations=50, tolerance=1e-6):
+    """PageRank sobre el grafo de similitud coseno entre tramos."""
+    similarity = matrix @ matrix.T
+    np.fill_diagonal(similarity, 0.0)
+    totals = similarity.sum(axis=1, keepdims=True)
+    transition = np.divide(similarity, totals, out=np.zeros_like(similarity), where=totals > 0)
+    n = len(matrix)
+    scores = np.full(n, 1.0 / n, dtype=np.float32)
+    for _ in range(iterations):
+        updated = (1 - damping) / n + damping * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < tolerance:
+            return updated
+        scores = updated
+    return scores
+
+
+def extract(segments, model, budget):
+    """Devuelve los segmentos de los tramos mejor puntuados, en su orden original, hasta budget tokens."""
+    spans = make_spans(segments)
+    texts = ["".join(segment["text"] for segment in span) for span in spans]
+    tokens = np.array([estimate_tokens(text, model) for text in texts])
+    if tokens.sum() <= budget:
+        return segments
+    scores = textrank(tfidf_matrix(texts))
+    selected, used = [], 0
+    for i in np.argsort(-scores):
+        if used + tokens[i] > budget:
+            continue
+        selected.append(i)
+        used += tokens[i]
+    selected.sort()
+    print(f"Extractivo: {len(selected)}/{len(spans)} tramos, {used}/{tokens.sum()} tokens estimados")
+    return [segment for i in selected for segment in spans[i]]
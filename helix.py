@@ -0,0 +1,99 @@
+# Cliente compartido de la API Helix de Twitch: token de aplicación en caché,
+# caché de user_id, sesión HTTP reutilizada y espera ante límites de peticiones (429)
+
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+TOKEN_URL = 'https://id.twitch.tv/oauth2/token'
+API_URL = 'https://api.twitch.tv/helix/'
+# Margen para renovar el token antes de que caduque de verdad
+TOKEN_MARGIN = 60
+MAX_RETRIES = 5
+
+
+class HelixClient:
+    def __init__(self, client_id, client_secret):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_maxsize=10))
+        self.token = None
+        self.token_expires = 0
+        self.user_ids = {}
+        self.lock = threading.Lock()
+
+    def get_token(self):
+        """Devuelve el token de aplicación, pidiendo uno nuevo solo si no hay o está a punto de caducar."""
+        with self.lock:
+            if self.token is None or time.time() > self.token_expires - TOKEN_MARGIN:
+                params = {
+                    'client_id': self.client_id,
+                    'client_secret': self.client_secret,
+                    'grant_type': 'client_credentials'
+                }
+                response = self.session.post(TOKEN_URL, params=params)
+                response_data = response.json()
+                if 'access_token' not in response_data:
+                    print(response_data)
+                    raise Exception("Error al obtener el token de acceso")
+                self.token = response_data['access_token']
+                self.token_expires = time.time() + response_data.get('expires_in', 3600)
+            return self.token
+
+    def invalidate_token(self):
+        with self.lock:
+            self.token = None
+
+    def get(self, endpoint, **params):
+        """GET a un endpoint de Helix. Reintenta una vez tras un 401 con token nuevo y espera en los 429."""
+        refreshed = False
+        for _ in range(MAX_RETRIES):
+            headers = {
+                'Client-ID': self.client_id,
+                'Authorization': f'Bearer {self.get_token()}'
+            }
+            response = self.session.get(API_URL + endpoint, headers=headers, params=params)
+            if response.status_code == 401:
+                # Un 401 con un token recién pedido no se arregla pidiendo otro
+                if refreshed:
+                    print(response.text)
+                    raise Exception(f"Helix rechazó el token nuevo en {endpoint}")
+                refreshed = True
+                self.invalidate_token()
+                continue
+            if response.status_code == 429:
+                # Ratelimit-Reset es el instante (epoch) en el que se recupera el cupo
+                reset = float(response.headers.get('Ratelimit-Reset', time.time() + 1))
+                wait = max(0.0, reset - time.time()) + 0.1
+                print(f"Límite de peticiones de Helix alcanzado, esperando {wait:.1f}s")
+                time.sleep(wait)
+                continue
+            return response.json()
+        raise Exception(f"Helix no respondió a {endpoint} tras {MAX_RETRIES} intentos")
+
+    def get_user_id(self, username):
+        username = username.lower()
+        if username not in self.user_ids:
+            data = self.get('users', login=username)
+            if 'data' in data and len(data['data']) > 0:
+                self.user_ids[username] = data['data'][0]['id']
+            else:
+                print(data)
+                raise Exception(f"No se encontró el User ID para el usuario {username}")
+        return self.user_ids[username]
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(client_id, client_secret):
+    """Devuelve el cliente compartido para estas credenciales, creándolo la primera vez."""
+    with _clients_lock:
+        key = (client_id, client_secret)
+        if key not in _clients:
+            _clients[key] = HelixClient(client_id, client_secret)
+        return _clients[key]
@@ -0,0 +1,89 @@
+# Detección de los mejores momentos del directo a partir del audio: volumen, excitación y ritmo de habla
+
+import librosa
+import numpy as np
+
+from audio_features import FRAME_LENGTH, HOP_LENGTH, stft_blocks
+from audio_stream import SAMPLE_RATE
+
+# Peso de cada indicador en la puntuación de una ventana
+WEIGHTS = {"loudness": 1.0, "excitement": 1.0, "laughter": 0.75, "speech_rate": 0.5}
+
+
+def frame_features(audio):
+    """Por frame: volumen en dB, centroide espectral (voz más aguda al gritar) y flujo espectral (ataques)."""
+    loudness, centroid, flux = [], [], []
+    for magnitude in stft_blocks(audio):
+        rms = librosa.feature.rms(S=magnitude, frame_length=FRAME_LENGTH)[0]
+        loudness.append(librosa.amplitude_to_db(rms, ref=1.0))
+        centroid.append(librosa.feature.spectral_centroid(S=magnitude, sr=SAMPLE_RATE)[0])
+        flux.append(librosa.onset.onset_strength(S=librosa.amplitude_to_db(magnitude), sr=SAMPLE_RATE))
+    if not loudness:
+        return np.empty(0), np.empty(0), np.empty(0)
+    return np.concatenate(loudness), np.concatenate(centroid), np.concatenate(flux)
+
+
+def _zscore(values):
+    return (values - values.mean()) / (values.std() + 1e-9)
+
+
+def window_scores(audio, segments=None, window=30.0):
+    """Puntúa ventanas consecutivas de window segundos. Devuelve (inicios, puntuaciones, indicadores)."""
+    loudness, centroid, flux = frame_features(audio)
+    frames_per_window = max(1, int(window * SAMPLE_RATE / HOP_LENGTH))
+    count = len(loudness) // frames_per_window
+    if count == 0:
+        return np.empty(0), np.empty(0), {}
+
+    def per_window(values):
+        return values[:count * frames_per_window].reshape(count, frames_per_window)
+
+    loud = per_window(loudness)
+    features = {
+        # Volumen alto sostenido
+        "loudness": np.percentile(loud, 90, axis=1),
+        # Voz más aguda y más variación de volumen que lo normal
+        "excitement": _zscore(per_window(centroid).mean(axis=1)) + _zscore(loud.std(axis=1)),
+        # Risas: muchos ataques seguidos con volumen alto
+        "laughter": (per_window(flux) > np.percentile(flux, 90)).mean(axis=1) * (loud.mean(axis=1) > np.median(loudness)),
+        "speech_rate": np.zeros(count),
+    }
+    starts = np.arange(count) * window
+    if segments:
+        # Palabras por segundo según los segmentos de Whisper que caen en cada ventana
+        words = np.zeros(count)
+        for segment in segments:
+            index = int(segment["start"] // window)
+            if index < count:
+                words[index] += len(segment["text"].split())
+        features["speech_rate"] = words / window
+    # Con una sola ventana ningún indicador varía y la puntuación se queda a cero
+    scores = np.zeros(count, dtype=np.float32)
+    for name, values in features.items():
+        if values.std() > 0:
+            scores += WEIGHTS[name] * _zscore(values)
+    return starts, scores, features
+
+
+def detect_highlights(audio, segments=None, window=30.0, top=10):
+    """Devuelve los top rangos (inicio, fin, puntuación) de más intensidad, del mejor al peor.
+
+    Las ventanas seleccionadas que están seguidas se unen en un único rango.
+    """
+    starts, scores, _ = window_scores(audio, segments, window)
+    if len(scores) == 0:
+        return []
+    chosen = sorted(np.argsort(-scores)[:top])
+    ranges = []
+    for i in chosen:
+        start, end, score = starts[i], starts[i] + window, scores[i]
+        if ranges and abs(ranges[-1][1] - start) < 1e-6:
+            ranges[-1] = (ranges[-1][0], end, max(ranges[-1][2], score))
+        else:
+            ranges.append((start, end, score))
+    return [(float(start), float(end), float(score))
+            for start, end, score in sorted(ranges, key=lambda r: -r[2])]
+
+
+def in_highlight(segment, highlights):
+    return any(start <= segment["start"] < end for start, end, _ in highlights)
@@ -0,0 +1,200 @@
+# Histórico de directos en SQLite: una fila por vídeo y actualizaciones atómicas por columna
+#
+# Migración desde el antiguo history.json: python history_store.py migrate history.json
+# Exportación al formato antiguo:          python history_store.py export history.json
+# Búsqueda en transcripciones y resúmenes: python history_store.py search "texto a buscar"
+
+import datetime
+import json
+import re
+import sqlite3
+import sys
+import threading
+
+from atomic_file import write_json
+
+FIELDS = ("date", "transcription", "summary_short", "summary_long")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    video_id TEXT PRIMARY KEY,
+    date TEXT NOT NULL,
+    transcription TEXT NOT NULL DEFAULT '',
+    summary_short TEXT NOT NULL DEFAULT '',
+    summary_long TEXT NOT NULL DEFAULT '',
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS videos_date ON videos (date);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Índice de texto completo sobre la tabla videos. unicode61 con remove_diacritics ignora
+# mayúsculas y tildes ("canción" encuentra "Cancion"). Los triggers lo mantienen al día
+# con cada cambio, así que nunca hay que reindexar el histórico entero.
+FTS_SCHEMA = (
+    """CREATE VIRTUAL TABLE videos_fts USING fts5(
+        transcription, summary_short, summary_long,
+        content='videos', content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER videos_fts_insert AFTER INSERT ON videos BEGIN
+        INSERT INTO videos_fts (rowid, transcription, summary_short, summary_long)
+        VALUES (new.rowid, new.transcription, new.summary_short, new.summary_long);
+    END""",
+    """CREATE TRIGGER videos_fts_delete AFTER DELETE ON videos BEGIN
+        INSERT INTO videos_fts (videos_fts, rowid, transcription, summary_short, summary_long)
+        VALUES ('delete', old.rowid, old.transcription, old.summary_short, old.summary_long);
+    END""",
+    """CREATE TRIGGER videos_fts_update AFTER UPDATE OF transcription, summary_short, summary_long ON videos BEGIN
+        INSERT INTO videos_fts (videos_fts, rowid, transcription, summary_short, summary_long)
+        VALUES ('delete', old.rowid, old.transcription, old.summary_short, old.summary_long);
+        INSERT INTO videos_fts (rowid, transcription, summary_short, summary_long)
+        VALUES (new.rowid, new.transcription, new.summary_short, new.summary_long);
+    END""",
+    "INSERT INTO videos_fts (videos_fts) VALUES ('rebuild')",
+)
+
+
+def now():
+    return datetime.datetime.now().isoformat()
+
+
+class HistoryStore:
+    def __init__(self, path='history.db'):
+        self.path = path
+        self.lock = threading.Lock()
+        # isolation_level=None: las transacciones se abren a mano con BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        # WAL permite que el bot o la web lean mientras summarize.py escribe
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.transaction():
+            for statement in SCHEMA.split(";"):
+                if statement.strip():
+                    self.conn.execute(statement)
+            exists = self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'videos_fts'").fetchone()
+            if not exists:
+                # Bases de datos anteriores al índice: crearlo e indexar lo que ya hay
+                for statement in FTS_SCHEMA:
+                    self.conn.execute(statement)
+
+    def transaction(self):
+        return _Transaction(self)
+
+    def close(self):
+        self.conn.close()
+
+    def get_last(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'last'").fetchone()
+        return row["value"] if row else None
+
+    def set_last(self, video_id):
+        with self.transaction():
+            self.conn.execute("INSERT INTO meta (key, value) VALUES ('last', ?) "
+                              "ON CONFLICT (key) DO UPDATE SET value = excluded.value", (str(video_id),))
+
+    def get(self, video_id):
+        row = self.conn.execute("SELECT * FROM videos WHERE video_id = ?", (str(video_id),)).fetchone()
+        return dict(row) if row else None
+
+    def video_ids(self):
+        return [row["video_id"] for row in self.conn.execute("SELECT video_id FROM videos ORDER BY date")]
+
+    def create(self, video_id, date=None):
+        """Crea la fila del vídeo vacía si no existe todavía."""
+        with self.transaction():
+            self.conn.execute("INSERT OR IGNORE INTO videos (video_id, date, updated_at) VALUES (?, ?, ?)",
+                              (str(video_id), date or now(), now()))
+
+    def update(self, video_id, **fields):
+        """Actualiza solo las columnas indicadas del vídeo en una única transacción."""
+        unknown = set(fields) - set(FIELDS)
+        if unknown:
+            raise Exception(f"Campos desconocidos en el histórico: {', '.join(sorted(unknown))}")
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self.transaction():
+            cursor = self.conn.execute(f"UPDATE videos SET {columns}, updated_at = ? WHERE video_id = ?",
+                                       (*fields.values(), now(), str(video_id)))
+            if cursor.rowcount == 0:
+                raise Exception(f"El vídeo {video_id} no está en el histórico")
+
+    def search(self, query, limit=10, prefix=True):
+        """Busca en transcripciones y resúmenes; devuelve video_id, fecha y un fragmento por vídeo.
+
+        Todas las palabras de la consulta tienen que aparecer. Con prefix, cada palabra
+        encuentra también las que empiezan por ella ("mazmorra" encuentra "mazmorras").
+        """
+        words = re.findall(r"\w+", query)
+        if not words:
+            return []
+        match = " ".join(f'"{word}"' + ("*" if prefix else "") for word in words)
+        rows = self.conn.execute(
+            "SELECT videos.video_id, videos.date, "
+            "snippet(videos_fts, -1, '[', ']', '…', 16) AS snippet "
+            "FROM videos_fts JOIN videos ON videos.rowid = videos_fts.rowid "
+            "WHERE videos_fts MATCH ? ORDER BY rank LIMIT ?", (match, limit))
+        return [dict(row) for row in rows]
+
+    def migrate_from_json(self, json_path):
+        """Importa el formato antiguo {"last": ..., "historic": {video_id: {...}}}."""
+        with open(json_path, 'r') as f:
+            history = json.load(f)
+        with self.transaction():
+            for video_id, entry in history["historic"].items():
+                self.conn.execute(
+                    "INSERT INTO videos (video_id, date, transcription, summary_short, summary_long, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (video_id) DO UPDATE SET "
+                    "date = excluded.date, transcription = excluded.transcription, "
+                    "summary_short = excluded.summary_short, summary_long = excluded.summary_long, "
+                    "updated_at = excluded.updated_at",
+                    (str(video_id), entry.get("date") or now(), entry.get("transcription", ""),
+                     entry.get("summary_short", ""), entry.get("summary_long", ""), now()))
+            if history.get("last"):
+                self.conn.execute("INSERT INTO meta (key, value) VALUES ('last', ?) "
+                                  "ON CONFLICT (key) DO UPDATE SET value = excluded.value", (str(history["last"]),))
+        print(f"Migrados {len(history['historic'])} vídeos de {json_path} a {self.path}")
+
+    def export_json(self, json_path):
+        """Escribe el histórico en el formato antiguo de history.json, de forma atómica."""
+        historic = {}
+        for row in self.conn.execute("SELECT * FROM videos ORDER BY date"):
+            historic[row["video_id"]] = {field: row[field] for field in FIELDS}
+        write_json(json_path, {"last": self.get_last(), "historic": historic})
+        print(f"Exportados {len(historic)} vídeos de {self.path} a {json_path}")
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, con ROLLBACK si hay una excepción."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __enter__(self):
+        self.store.lock.acquire()
+        self.store.conn.execute("BEGIN IMMEDIATE")
+        return self.store.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.store.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.store.lock.release()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] not in ("migrate", "export", "search"):
+        print("Uso: python history_store.py migrate|export history.json")
+        print("     python history_store.py search \"texto a buscar\"")
+        sys.exit(1)
+    store = HistoryStore()
+    if sys.argv[1] == "migrate":
+        store.migrate_from_json(sys.argv[2])
+    elif sys.argv[1] == "export":
+        store.export_json(sys.argv[2])
+    else:
+        for result in store.search(sys.argv[2]):
+            print(f"{result['video_id']} ({result['date'][:10]}): {result['snippet']}")
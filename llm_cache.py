@@ -0,0 +1,78 @@
+# Caché en disco de respuestas del LLM, direccionada por contenido y con expulsión LRU por tamaño
+
+import hashlib
+import json
+import os
+import threading
+
+from atomic_file import write_json
+
+
+class LLMCache:
+    def __init__(self, directory='.llm_cache', max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.total_bytes = sum(os.path.getsize(path) for path in self._entries())
+
+    @staticmethod
+    def key(model, messages, options=None):
+        payload = json.dumps({"model": model, "messages": messages, "options": options or {}},
+                             sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.json')
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.json'):
+                    yield os.path.join(root, name)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'r') as f:
+                response = json.load(f)
+            # La fecha de modificación hace de marca de último uso para la expulsión LRU
+            os.utime(path)
+        except (OSError, ValueError):
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return response
+
+    def put(self, key, response):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+        write_json(path, response, ensure_ascii=False)
+        size = os.path.getsize(path)
+        with self.lock:
+            self.total_bytes += size - previous
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Borrar las entradas menos usadas recientemente hasta bajar del 90% del límite
+        entries = sorted(self._entries(), key=os.path.getmtime)
+        for path in entries:
+            if self.total_bytes <= self.max_bytes * 0.9:
+                break
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                self.total_bytes -= size
+            except OSError:
+                pass
+
+    def report(self):
+        total = self.hits + self.misses
+        print(f"Caché LLM: {self.hits} aciertos, {self.misses} fallos "
+              f"({self.hits / total if total else 0:.0%}), {self.total_bytes / (1024 * 1024):.1f} MB en {self.directory}")
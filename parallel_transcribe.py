@@ -0,0 +1,95 @@
+# Transcripción en paralelo de un audio largo, troceado en ventanas solapadas
+
+import json
+import math
+import os
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+from audio_stream import load_audio
+from transcription_engines import get_engine
+
+# Motor de transcripción cargado en cada proceso del pool
+_engine = None
+
+
+def get_duration(audio_path):
+    output = subprocess.run(["ffprobe", "-v", "error", "-show_entries", "format=duration",
+                             "-of", "json", audio_path],
+                            capture_output=True, check=True).stdout
+    return float(json.loads(output)["format"]["duration"])
+
+
+def make_shards(duration, workers, overlap=10, max_shard=900):
+    """Divide [0, duration) en ventanas de como mucho max_shard segundos más el solape.
+
+    Se generan al menos tantas ventanas como workers, y ventanas cortas para que los
+    procesos que acaben antes puedan coger más trabajo.
+    """
+    count = max(workers, math.ceil(duration / max_shard))
+    step = duration / count
+    return [(i * step, min(step + overlap, duration - i * step)) for i in range(count)]
+
+
+def _init_worker(engine_name, model_name, threads):
+    global _engine
+    _engine = get_engine(engine_name, model_name, threads=threads)
+    _engine.load()
+
+
+def _transcribe_shard(job):
+    audio_path, start, duration, language = job
+    audio = load_audio(audio_path, start, duration)
+    result = _engine.transcribe(audio, language=language)
+    return start, result["segments"]
+
+
+def merge_shards(shards, overlap):
+    """Une los segmentos de cada ventana en tiempo absoluto, quitando los repetidos del solape.
+
+    En cada solape se corta por la mitad: de la ventana anterior se quedan los segmentos
+    que empiezan antes del punto de corte y de la siguiente los que empiezan después.
+    """
+    shards = sorted(shards, key=lambda shard: shard[0])
+    merged = []
+    for index, (start, segments) in enumerate(shards):
+        lower = start + overlap / 2 if index > 0 else float('-inf')
+        upper = shards[index + 1][0] + overlap / 2 if index + 1 < len(shards) else float('inf')
+        for segment in segments:
+            segment = dict(segment, start=segment["start"] + start, end=segment["end"] + start)
+            if not lower <= segment["start"] < upper:
+                continue
+            # El corte puede caer en mitad de una frase que ambas ventanas transcriben igual
+            if merged and segment["text"].strip() == merged[-1]["text"].strip():
+                merged[-1]["end"] = max(merged[-1]["end"], segment["end"])
+                continue
+            merged.append(segment)
+    for i, segment in enumerate(merged):
+        segment["id"] = i
+        segment["seek"] = int(segment["start"] * 100)
+    return merged
+
+
+def transcribe_parallel(audio_path, workers=None, engine_name=None, model_name=None, language="es", overlap=10):
+    """Transcribe audio_path con un pool de procesos y devuelve el mismo formato que whisper.transcribe.
+
+    Sin engine_name ni model_name se usan WHISPER_ENGINE y WHISPER_MODEL (ver transcription_engines).
+    """
+    workers = workers or os.cpu_count()
+    threads = max(1, os.cpu_count() // workers)
+    duration = get_duration(audio_path)
+    shards = make_shards(duration, workers, overlap=overlap)
+    print(f"Transcribiendo {duration:.0f}s de audio en {len(shards)} ventanas con {workers} procesos "
+          f"de {threads} hilos")
+
+    jobs = [(audio_path, start, length, language) for start, length in shards]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(engine_name, model_name, threads)) as pool:
+        results = list(pool.map(_transcribe_shard, jobs))
+
+    segments = merge_shards(results, overlap)
+    return {
+        "text": "".join(segment["text"] for segment in segments),
+        "segments": segments,
+        "language": language,
+    }
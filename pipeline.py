@@ -0,0 +1,206 @@
+# Pipeline por etapas de un vídeo: fetch -> download -> transcribe -> summarize -> publish
+#
+# Cada etapa guarda en work/<video_id>/<etapa>.json su salida y la huella de sus entradas
+# (la salida de la etapa anterior y la configuración que le afecta). Al relanzar, las
+# etapas cuya huella no ha cambiado se saltan y se sigue desde la primera que está obsoleta.
+# Si el histórico ya tiene la transcripción del vídeo, download y transcribe no se repiten.
+
+import hashlib
+import json
+import os
+
+from atomic_file import write_json, write_text
+from chat_summary import chat_chunks, digest, summary_text
+from chunker import get_num_ctx
+
+STAGES = ("fetch", "download", "transcribe", "summarize", "publish")
+
+
+def fingerprint(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+class Pipeline:
+    def __init__(self, recap, history, video_id, llm_model, work_dir='work', force_stages=(),
+                 stream=False, vad=False, update_last=True, date=None, extractive_budget=None,
+                 highlights=None):
+        self.recap = recap
+        self.history = history
+        self.video_id = str(video_id)
+        self.directory = os.path.join(work_dir, self.video_id)
+        self.force_stages = set(force_stages)
+        self.stream = stream
+        self.vad = vad
+        self.llm_model = llm_model
+        self.extractive_budget = extractive_budget
+        # None, "mark" (marcar los mejores momentos en el prompt) u "only" (resumir solo esos)
+        self.highlights = highlights
+        # Al recuperar vídeos antiguos no hay que tocar cuál es el último directo
+        self.update_last = update_last
+        self.date = date
+        self.outputs = {}
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def config(self, stage):
+        """Configuración que, si cambia, invalida la etapa."""
+        if stage == "download":
+            return {"stream": self.stream}
+        if stage == "transcribe":
+            return {"stream": self.stream, "vad": self.vad,
+                    "engine": os.getenv('WHISPER_ENGINE', 'whisper'),
+                    "model": os.getenv('WHISPER_MODEL', 'medium')}
+        if stage == "summarize":
+            return {"model": self.llm_model, "num_ctx": get_num_ctx(), "extractive": self.extractive_budget,
+                    "highlights": self.highlights}
+        return {}
+
+    def inputs(self, stage):
+        index = STAGES.index(stage)
+        previous = self.outputs[STAGES[index - 1]] if index > 0 else {"video_id": self.video_id}
+        return {"previous": fingerprint(previous), "config": self.config(stage)}
+
+    def run(self, until=None, reuse_previous=False):
+        """Ejecuta las etapas hasta until (incluida).
+
+        Con reuse_previous las etapas anteriores a until que ya tienen artefacto se reutilizan
+        aunque su configuración haya cambiado: es lo que hacen los subcomandos de summarize.py,
+        para que relanzar un resumen no repita la transcripción por no repetir las mismas opciones.
+        """
+        for stage in STAGES:
+            self.run_stage(stage, reuse=reuse_previous and stage != until)
+            if stage == until:
+                break
+        return self.outputs
+
+    def run_stage(self, stage, reuse=False):
+        artifact_path = self.path(stage + ".json")
+        stage_fingerprint = fingerprint(self.inputs(stage))
+        if stage not in self.force_stages and os.path.exists(artifact_path):
+            with open(artifact_path, 'r') as f:
+                artifact = json.load(f)
+            if reuse or artifact["fingerprint"] == stage_fingerprint:
+                print(f"[{self.video_id}] {stage}: al día, se salta")
+                self.outputs[stage] = artifact["output"]
+                return artifact["output"]
+        output = self.history_output(stage)
+        if output is not None:
+            print(f"[{self.video_id}] {stage}: ya hay transcripción en el histórico, se salta")
+        else:
+            print(f"[{self.video_id}] {stage}: ejecutando")
+            output = getattr(self, "stage_" + stage)()
+        # Escritura atómica: un corte nunca deja un artefacto a medias
+        write_json(artifact_path, {"fingerprint": stage_fingerprint, "output": output}, ensure_ascii=False)
+        self.outputs[stage] = output
+        return output
+
+    def history_output(self, stage):
+        """Salida de download o transcribe a partir de la transcripción ya guardada en el histórico.
+
+        Los vídeos transcritos antes del pipeline (por ejemplo, los migrados de history.json) no
+        tienen artefactos en work/, pero no hay que volver a descargarlos ni transcribirlos.
+        """
+        if stage == "download":
+            if ("transcribe" in self.force_stages or "download" in self.force_stages
+                    or os.path.exists(self.path("transcribe.json"))):
+                return None
+            entry = self.history.get(self.video_id)
+            if entry is None or entry["transcription"] == "":
+                return None
+            return {"from_history": True}
+        if stage == "transcribe" and self.outputs["download"].get("from_history"):
+            if "transcribe" in self.force_stages:
+                return None
+            text = self.history.get(self.video_id)["transcription"]
+            transcription_path = self.path("transcription.json")
+            write_json(transcription_path, {"text": text}, ensure_ascii=False)
+            return {"path": transcription_path, "sha256": fingerprint(text), "from_history": True}
+        return None
+
+    def audio_path(self):
+        """WAV de la etapa download; falla con un mensaje claro si no se descargó o ya se borró."""
+        audio_path = self.outputs["download"].get("audio_path")
+        if audio_path is None or not os.path.exists(audio_path):
+            raise Exception(f"El vídeo {self.video_id} no tiene audio descargado: "
+                            "usa --force-stage download para volver a descargarlo")
+        return audio_path
+
+    def remove_audio(self):
+        """Borra el WAV del vídeo; los artefactos de las etapas se conservan."""
+        audio_path = self.path("audio.wav")
+        if os.path.exists(audio_path):
+            os.remove(audio_path)
+            print(f"[{self.video_id}] audio borrado")
+
+    def stage_fetch(self):
+        url = self.recap.get_m3u8_url(self.video_id)
+        print(f"URL del archivo .m3u8: {url}")
+        self.history.create(self.video_id, self.date)
+        if self.update_last:
+            self.history.set_last(self.video_id)
+        return {"url": url}
+
+    def stage_download(self):
+        if self.stream:
+            # En modo streaming la descarga se hace a la vez que la transcripción
+            return {"stream": True, "url": self.outputs["fetch"]["url"]}
+        audio_path = self.path("audio.wav")
+        self.recap.ffmpeg_audio_download(self.outputs["fetch"]["url"], audio_path)
+        # Los segmentos .ts y su manifiesto solo sirven para reanudar la descarga: ya hay WAV
+        for name in (audio_path + ".ts", audio_path + ".ts.manifest.json"):
+            if os.path.exists(name):
+                os.remove(name)
+        stat = os.stat(audio_path)
+        return {"audio_path": audio_path, "size": stat.st_size, "mtime": stat.st_mtime}
+
+    def stage_transcribe(self):
+        transcription_path = self.path("transcription.json")
+        if self.stream:
+            transcription = self.recap.transcribe_stream(self.outputs["fetch"]["url"],
+                                                         output_path=transcription_path)
+        else:
+            transcription = self.recap.transcribe(self.audio_path(), vad=self.vad,
+                                                  output_path=transcription_path)
+        self.history.update(self.video_id, transcription=transcription["text"])
+        return {"path": transcription_path, "sha256": fingerprint(transcription["text"])}
+
+    def stage_summarize(self):
+        with open(self.outputs["transcribe"]["path"], 'r') as f:
+            transcription = json.load(f)
+        highlights = None
+        if self.highlights and not self.outputs["download"].get("stream"):
+            from audio_stream import load_audio
+            from highlights import detect_highlights
+
+            highlights = detect_highlights(load_audio(self.audio_path()),
+                                           transcription.get("segments"))
+            for start, end, score in highlights:
+                print(f"Momento destacado {int(start // 60)}:{int(start % 60):02d}-"
+                      f"{int(end // 60)}:{int(end % 60):02d} (puntuación {score:.2f})")
+        summary_long, summary_short = self.recap.summarize_text(transcription["text"], self.recap.username,
+                                                                segments=transcription.get("segments"),
+                                                                extractive_budget=self.extractive_budget,
+                                                                highlights=highlights,
+                                                                highlights_only=self.highlights == "only")
+        print(summary_long)
+        print("====================================")
+        print(summary_short)
+        self.history.update(self.video_id, summary_short=summary_short, summary_long=summary_long)
+        return {"summary_long": summary_long, "summary_short": summary_short}
+
+    def stage_publish(self):
+        summary = self.outputs["summarize"]
+        # Crea un public gist en GitHub con el resumen y dame la url
+        url = self.recap.create_gist(summary["summary_long"])
+        print(f"Resumen: {url}")
+        text = summary_text(summary["summary_short"], url)
+        # Versión ya troceada para el chat, para que el !resumen del bot no tenga que acortarla con el LLM.
+        # Se escribe antes que summary.txt para que el bot la encuentre en cuanto vea el cambio.
+        write_json('summary_chat.json', {"sha256": digest(text),
+                                         "chunks": chat_chunks(summary["summary_short"], url)},
+                   ensure_ascii=False)
+        # También atómico: el bot lee summary.txt mientras se escribe y no debe ver un fichero vacío
+        write_text('summary.txt', text)
+        return {"url": url}
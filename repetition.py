@@ -0,0 +1,100 @@
+# Eliminación de los bucles de repetición de Whisper ("Y que se ha ido bien" seis veces seguidas)
+
+import difflib
+import re
+
+WORD_RE = re.compile(r"\w+")
+
+
+def _normalize(text):
+    return " ".join(WORD_RE.findall(text.lower()))
+
+
+def _kept_words(words, max_ngram=12, min_repeats=3):
+    """Índices de las palabras que quedan al dejar una sola copia de cada n-grama repetido.
+
+    Recorre las palabras una vez; en cada posición prueba n-gramas de hasta max_ngram
+    palabras y, si se repiten min_repeats o más veces seguidas, salta todas las copias
+    de golpe, así que el coste es lineal en el número de palabras.
+    """
+    # Comparar identificadores enteros de las palabras normalizadas (sin mayúsculas ni signos)
+    ids = {}
+    tokens = [ids.setdefault(_normalize(word), len(ids)) for word in words]
+    total = len(tokens)
+    kept = []
+    i = 0
+    while i < total:
+        best_n, best_repeats = 0, 0
+        first = tokens[i]
+        for n in range(1, min(max_ngram, (total - i) // min_repeats) + 1):
+            # Descartar rápido los n que ni siquiera repiten la primera palabra
+            if tokens[i + n] != first:
+                continue
+            pattern = tokens[i:i + n]
+            repeats = 1
+            while tokens[i + repeats * n:i + (repeats + 1) * n] == pattern:
+                repeats += 1
+            if repeats >= min_repeats and repeats * n > best_repeats * best_n:
+                best_n, best_repeats = n, repeats
+        if best_n:
+            kept.extend(range(i, i + best_n))
+            i += best_n * best_repeats
+        else:
+            kept.append(i)
+            i += 1
+    return kept
+
+
+def collapse_repeats(text, max_ngram=12, min_repeats=3):
+    words = text.split()
+    return " ".join(words[i] for i in _kept_words(words, max_ngram, min_repeats))
+
+
+def _similar(a, b, similarity, max_length=400):
+    if a == b:
+        return True
+    # Los segmentos de Whisper son cortos; no merece la pena comparar textos largos
+    if len(a) > max_length or len(b) > max_length or min(len(a), len(b)) < similarity * max(len(a), len(b)):
+        return False
+    matcher = difflib.SequenceMatcher(None, a, b)
+    return matcher.quick_ratio() >= similarity and matcher.ratio() >= similarity
+
+
+def collapse_segments(segments, similarity=0.9):
+    """Quita los bucles de repetición de una lista de segmentos de Whisper.
+
+    Los bucles suelen cruzar segmentos, así que los n-gramas se buscan sobre todas las
+    palabras seguidas y luego se reparten de vuelta a su segmento. Después se unen los
+    segmentos contiguos casi idénticos, alargando el tiempo de fin del que se queda.
+    """
+    words, owners = [], []
+    for index, segment in enumerate(segments):
+        segment_words = segment["text"].split()
+        words.extend(segment_words)
+        owners.extend([index] * len(segment_words))
+
+    kept = {}
+    for i in _kept_words(words):
+        kept.setdefault(owners[i], []).append(words[i])
+
+    collapsed = []
+    previous = None
+    for index, segment in enumerate(segments):
+        if index not in kept:
+            continue
+        text = " ".join(kept[index])
+        normalized = _normalize(text)
+        if previous is not None and _similar(normalized, previous, similarity):
+            if "end" in segment:
+                collapsed[-1]["end"] = segment["end"]
+            continue
+        collapsed.append(dict(segment, text=" " + text))
+        previous = normalized
+    return collapsed
+
+
+def reduction(before, after):
+    """Fracción de caracteres eliminada entre dos listas de segmentos."""
+    size_before = sum(len(segment["text"]) for segment in before)
+    size_after = sum(len(segment["text"]) for segment in after)
+    return 1 - size_after / size_before if size_before else 0.0
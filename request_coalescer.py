@@ -0,0 +1,61 @@
+# Cola de peticiones por canal que agrupa las ráfagas de !veronica en una sola respuesta
+#
+# Las peticiones que llegan con menos de window segundos entre sí se juntan y solo se contesta
+# la última (la conversación ya contiene las anteriores). Las que llevan más de deadline
+# segundos esperando se descartan: en un chat rápido una respuesta tan tardía ya no tiene sentido.
+
+import asyncio
+import time
+
+
+class RequestCoalescer:
+    def __init__(self, handler, window=3.0, deadline=30.0, max_wait=None):
+        # handler es una corrutina handler(request) que genera y envía la respuesta
+        self.handler = handler
+        self.window = window
+        self.deadline = deadline
+        # Tiempo máximo agrupando aunque sigan llegando peticiones, para no dejar el chat sin respuesta
+        self.max_wait = max_wait if max_wait is not None else 2 * window
+        self.pending = {}
+        self.workers = {}
+        self.stats = {"received": 0, "answered": 0, "coalesced": 0, "dropped": 0}
+
+    def submit(self, channel, request):
+        self.stats["received"] += 1
+        self.pending.setdefault(channel, []).append((time.monotonic(), request))
+        if channel not in self.workers:
+            self.workers[channel] = asyncio.create_task(self._worker(channel))
+
+    async def _worker(self, channel):
+        try:
+            while self.pending.get(channel):
+                await self._wait_for_quiet(channel)
+                batch = self.pending.pop(channel)
+                now = time.monotonic()
+                fresh = [request for submitted, request in batch if now - submitted <= self.deadline]
+                self.stats["dropped"] += len(batch) - len(fresh)
+                if not fresh:
+                    print(f"[{channel}] {len(batch)} peticiones descartadas por llevar más de {self.deadline:.0f}s esperando")
+                    continue
+                self.stats["coalesced"] += len(fresh) - 1
+                self.stats["answered"] += 1
+                if len(batch) > 1:
+                    print(f"[{channel}] {len(batch)} peticiones agrupadas en una respuesta "
+                          f"({len(batch) - len(fresh)} caducadas)")
+                try:
+                    await self.handler(fresh[-1])
+                except Exception as e:
+                    print(f"Error al responder en {channel}: {e}")
+        finally:
+            del self.workers[channel]
+
+    async def _wait_for_quiet(self, channel):
+        # Esperar a que pase window sin peticiones nuevas, como mucho max_wait desde la primera
+        while True:
+            batch = self.pending[channel]
+            now = time.monotonic()
+            quiet_at = batch[-1][0] + self.window
+            limit = batch[0][0] + self.max_wait
+            if now >= quiet_at or now >= limit:
+                return
+            await asyncio.sleep(min(quiet_at, limit) - now)
@@ -0,0 +1,210 @@
+# Descarga paralela de los segmentos .ts de una playlist M3U8 de Twitch
+
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+import requests
+import tqdm
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from atomic_file import write_json
+
+# Cada cuántos segmentos escritos se guarda el manifiesto en disco
+MANIFEST_SAVE_EVERY = 25
+
+
+def parse_playlist(playlist_url, playlist_content):
+    """Devuelve la lista ordenada de (nombre, url) de los segmentos .ts de la playlist."""
+    segments = []
+    for line in playlist_content.splitlines():
+        line = line.strip()
+        if line.endswith('.ts'):
+            segments.append((line, urljoin(playlist_url, line)))
+    return segments
+
+
+def load_manifest(manifest_path, source):
+    """Carga el manifiesto de una descarga anterior del mismo vídeo, si existe."""
+    if manifest_path is None or not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Manifiesto {manifest_path} ilegible, se descarga de nuevo: {e}")
+        return None
+    if manifest.get("source") != source:
+        print(f"El manifiesto {manifest_path} es de otro vídeo, se descarga de nuevo")
+        return None
+    return manifest
+
+
+def save_manifest(manifest_path, manifest):
+    """Guarda el manifiesto de forma atómica para que un corte no lo deje a medias."""
+    write_json(manifest_path, manifest)
+
+
+class SegmentDownloader:
+    def __init__(self, max_workers=8, timeout=30, retries=3):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        # Una única sesión con un pool de conexiones del tamaño del pool de hilos
+        self.session = requests.Session()
+        retry = Retry(total=retries, backoff_factor=0.5,
+                      status_forcelist=(429, 500, 502, 503, 504))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def fetch_playlist(self, playlist_url):
+        response = self.session.get(playlist_url, timeout=self.timeout)
+        response.raise_for_status()
+        return parse_playlist(playlist_url, response.text)
+
+    def fetch_segment(self, segment_url):
+        response = self.session.get(segment_url, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.content
+        return data, hashlib.sha256(data).hexdigest()
+
+    def _verify(self, segments, manifest, output_file):
+        """Comprueba contra el fichero de salida los segmentos que el manifiesto da por buenos.
+
+        Devuelve el número de segmentos iniciales que ya están en disco y los índices de los
+        que están corruptos dentro de ese tramo (tienen el tamaño correcto pero no el hash).
+        """
+        if manifest is None or not os.path.exists(output_file):
+            return 0, []
+        done = manifest["segments"]
+        file_size = os.path.getsize(output_file)
+        valid, corrupt = 0, []
+        with open(output_file, 'rb') as f:
+            for index, (name, _) in enumerate(segments):
+                entry = done.get(name)
+                if entry is None or entry["offset"] + entry["size"] > file_size:
+                    break
+                f.seek(entry["offset"])
+                if hashlib.sha256(f.read(entry["size"])).hexdigest() != entry["sha256"]:
+                    corrupt.append(index)
+                valid = index + 1
+        return valid, corrupt
+
+    def download(self, playlist_url, output_file, manifest_path=None, source=None):
+        """Descarga todos los segmentos de la playlist y los escribe en orden en output_file.
+
+        Los segmentos se piden en paralelo pero se escriben en su posición del fichero
+        en cuanto están disponibles todos los anteriores. Como mucho hay 2 * max_workers
+        segmentos en memoria, así que la memoria no depende de la duración del directo.
+
+        Si se indica manifest_path, se guarda en él el offset, tamaño y sha256 de cada
+        segmento escrito. Al relanzar la descarga del mismo source (la URL del vídeo; la
+        de la playlist cambia en cada petición) solo se piden los segmentos que faltan o
+        cuyo hash no coincide con lo que hay en disco.
+        """
+        source = source or playlist_url
+        segments = self.fetch_playlist(playlist_url)
+        manifest = load_manifest(manifest_path, source)
+        valid, corrupt = self._verify(segments, manifest, output_file)
+        if manifest is None or valid == 0:
+            manifest = {"source": source, "segments": {}}
+        else:
+            print(f"Reanudando descarga: {valid - len(corrupt)}/{len(segments)} segmentos ya en disco, "
+                  f"{len(corrupt)} corruptos")
+        done = manifest["segments"]
+
+        window = self.max_workers * 2
+        fetched_bytes = 0
+        fetched = 0
+        start = time.monotonic()
+
+        mode = 'r+b' if valid > 0 else 'wb'
+        with open(output_file, mode) as of, \
+                ThreadPoolExecutor(max_workers=self.max_workers) as pool, \
+                tqdm.tqdm(total=len(segments), initial=valid - len(corrupt), unit='seg') as progress:
+            try:
+                # Reparar en su sitio los segmentos corruptos del tramo ya descargado
+                futures = [(index, pool.submit(self.fetch_segment, segments[index][1]))
+                           for index in corrupt]
+                resized = None
+                for index, future in futures:
+                    name = segments[index][0]
+                    data, digest = future.result()
+                    entry = done[name]
+                    fetched_bytes += len(data)
+                    fetched += 1
+                    if len(data) != entry["size"]:
+                        # No cabe en su hueco: todo lo que viene detrás hay que reescribirlo,
+                        # empezando por este segmento, que ya está descargado
+                        valid = index
+                        resized = (name, data, digest)
+                        progress.n = valid
+                        progress.refresh()
+                        break
+                    of.seek(entry["offset"])
+                    of.write(data)
+                    entry["sha256"] = digest
+                    progress.update(1)
+
+                # Descartar lo que haya detrás del último segmento válido y continuar desde ahí
+                for name, _ in segments[valid:]:
+                    done.pop(name, None)
+                offset = 0
+                if valid > 0:
+                    last = done[segments[valid - 1][0]]
+                    offset = last["offset"] + last["size"]
+                of.seek(offset)
+                of.truncate()
+                next_segment = valid
+                if resized is not None:
+                    name, data, digest = resized
+                    of.write(data)
+                    done[name] = {"offset": offset, "size": len(data), "sha256": digest}
+                    offset += len(data)
+                    next_segment += 1
+                    progress.update(1)
+
+                pending = deque()
+                written = 0
+                while next_segment < len(segments) or pending:
+                    # Mantener la ventana de descargas en vuelo llena
+                    while next_segment < len(segments) and len(pending) < window:
+                        name, segment_url = segments[next_segment]
+                        pending.append((name, pool.submit(self.fetch_segment, segment_url)))
+                        next_segment += 1
+                    name, future = pending.popleft()
+                    data, digest = future.result()
+                    of.write(data)
+                    done[name] = {"offset": offset, "size": len(data), "sha256": digest}
+                    offset += len(data)
+                    fetched_bytes += len(data)
+                    fetched += 1
+                    written += 1
+                    progress.update(1)
+                    if manifest_path is not None and written % MANIFEST_SAVE_EVERY == 0:
+                        of.flush()
+                        save_manifest(manifest_path, manifest)
+            finally:
+                # Guardar lo escrito también si falla un segmento, para que al reanudar
+                # solo se pidan los que faltan de verdad
+                if manifest_path is not None:
+                    of.flush()
+                    save_manifest(manifest_path, manifest)
+
+        elapsed = max(time.monotonic() - start, 1e-9)
+        stats = {
+            "segments": len(segments),
+            "fetched": fetched,
+            "bytes": fetched_bytes,
+            "seconds": elapsed,
+            "segments_per_s": fetched / elapsed,
+            "mb_per_s": fetched_bytes / elapsed / (1024 * 1024),
+        }
+        print(f"Descargados {fetched}/{len(segments)} segmentos ({fetched_bytes / (1024 * 1024):.1f} MB) "
+              f"en {elapsed:.1f}s: {stats['segments_per_s']:.1f} seg/s, {stats['mb_per_s']:.2f} MB/s")
+        return stats
@@ -31,6 +31,12 @@ def setup_signal_handlers(bot_instance):
             # Reinicia la memoria pero mantén los mensajes del sistema
             for channel in bot_instance.messages:
                 debug_log(f"Reiniciando memoria para el canal: {channel}")
+                if hasattr(bot_instance.messages, 'reset'):
+                    # ConversationMemory: conserva el prompt de sistema y olvida turnos y resumen
+                    previous_count = len(bot_instance.messages[channel])
+                    bot_instance.messages.reset(channel)
+                    debug_log(f"Canal {channel}: {previous_count - 1} mensajes eliminados, prompt del sistema conservado")
+                    continue
                 # Guarda solo el mensaje del sistema si existe
                 system_messages = [msg for msg in bot_instance.messages[channel] if msg.get('role') == 'system']
                 previous_count = len(bot_instance.messages[channel])
@@ -1,21 +1,22 @@
-import requests
+# Los imports pesados (torch, whisper, librosa, moviepy, av, streamlink, numpy, ollama) se hacen
+# dentro de los métodos que los usan, para que cada subcomando cargue solo lo que necesita
+# (ver benchmarks/bench_import_time.py)
+import argparse
 import json
-import datetime
-from openai import OpenAI
-import av
-import whisper
-import streamlink
-import requests
 import os
-import tempfile
-import tqdm
-from moviepy.editor import concatenate_videoclips, VideoFileClip
-import torchaudio
-import librosa
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
 from dotenv import load_dotenv
-import sys
-import torch
-from ollama import Client
+
+from chunker import chunk_segments, get_num_ctx, segments_from_text
+from repetition import collapse_segments, reduction
+from llm_cache import LLMCache
+from history_store import HistoryStore
+from pipeline import STAGES, Pipeline
+from helix import get_client as get_helix_client
 
 load_dotenv()
 
@@ -23,79 +24,77 @@ load_dotenv()
 client_id = os.getenv('CLIENT_ID')
 client_secret = os.getenv('CLIENT_SECRET')
 #client = OpenAI(base_url="http://localhost:1234/v1", api_key="lm-studio")
-client = Client(host=os.getenv('OLLAMA_HOST'))
+# El cliente de Ollama se crea la primera vez que se usa (get_llm_client)
+client = None
+client_lock = threading.Lock()
 model = "llama3.3:70b"
+HIGHLIGHT_MARK = "[DESTACADO]"
+
+
+def get_llm_client():
+    global client
+    with client_lock:
+        if client is None:
+            from ollama import Client
+            client = Client(host=os.getenv('OLLAMA_HOST'))
+    return client
+
 
 class Recap:
-    def __init__(self, username, openai_client, client_id=None, client_secret=None):
+    def __init__(self, username, openai_client=None, client_id=None, client_secret=None, llm_cache=None):
         self.username = username
         self.client_id = client_id
         self.client_secret = client_secret
         self.openai_client = openai_client
-        self.access_token = None
+        self.helix = get_helix_client(client_id, client_secret)
         self.user_id = None
-
-    # Obtener token de acceso de Twitch
+        # Un motor por hilo: whisper guarda la caché de atención en el propio modelo mientras
+        # decodifica, así que dos transcripciones a la vez sobre el mismo modelo se pisan
+        self.engines = threading.local()
+        self.llm_stats = []
+        self.stats_lock = threading.Lock()
+        self.llm_cache = llm_cache
+
+    # Obtener token de acceso de Twitch (se reutiliza hasta que caduca)
     def get_twitch_token(self, client_id, client_secret):
-        url = 'https://id.twitch.tv/oauth2/token'
-        params = {
-            'client_id': client_id,
-            'client_secret': client_secret,
-            'grant_type': 'client_credentials'
-        }
-        response = requests.post(url, params=params)
-        response_data = response.json()
-        if 'access_token' in response_data:
-            return response_data['access_token']
-        else:
-            print(response_data)
-            raise Exception("Error al obtener el token de acceso")
+        return get_helix_client(client_id, client_secret).get_token()
 
     # Obtener el user_id del nombre de usuario
     def get_user_id(self, username):
-        self.access_token = self.get_twitch_token(self.client_id, self.client_secret)
-        headers = {
-            'Client-ID': self.client_id,
-            'Authorization': f'Bearer {self.access_token}'
-        }
-        url = f'https://api.twitch.tv/helix/users?login={username}'
-        response = requests.get(url, headers=headers)
-        data = response.json()
-        if 'data' in data and len(data['data']) > 0:
-            return data['data'][0]['id']
-        else:
-            print(data)
-            raise Exception(f"No se encontró el User ID para el usuario {username}")
+        return self.helix.get_user_id(username)
 
     # Obtener el último directo usando el user_id
     def get_last_stream(self):
-        if self.access_token is None:
-            self.access_token = self.get_twitch_token(self.client_id, self.client_secret)
         if self.user_id is None:
             self.user_id = self.get_user_id(self.username)
-        headers = {
-            'Client-ID': self.client_id,
-            'Authorization': f'Bearer {self.access_token}'
-        }
-        url = f'https://api.twitch.tv/helix/videos?user_id={self.user_id}&first=1'
-        response = requests.get(url, headers=headers)
-        data = response.json()
+        data = self.helix.get('videos', user_id=self.user_id, first=1)
         if 'data' in data and len(data['data']) > 0:
             return data['data'][0]
         else:
             print(data)
             raise Exception("No se encontró ningún directo")
 
+    # Recorrer todos los vídeos del canal, del más reciente al más antiguo
+    def iter_videos(self, video_type="archive"):
+        if self.user_id is None:
+            self.user_id = self.get_user_id(self.username)
+        cursor = None
+        while True:
+            params = {'user_id': self.user_id, 'first': 100, 'type': video_type}
+            if cursor:
+                params['after'] = cursor
+            data = self.helix.get('videos', **params)
+            if 'data' not in data:
+                print(data)
+                raise Exception("Error al obtener la lista de vídeos")
+            yield from data['data']
+            cursor = data.get('pagination', {}).get('cursor')
+            if not cursor or not data['data']:
+                break
 
     # Obtener la URL del archivo .m3u8 del video
     def get_m3u8_url(self, video_id):
-        headers = {
-            'Client-ID': self.client_id,
-            'Authorization': f'Bearer {self.access_token}'
-        }
-        url = f'https://api.twitch.tv/helix/videos?id={video_id}'
-        response = requests.get(url, headers=headers)
-        data = response.json()
+        data = self.helix.get('videos', id=video_id)
         if 'data' in data and len(data['data']) > 0:
             video_data = data['data'][0]
             playback_url = video_data['url']
@@ -104,50 +103,23 @@ class Recap:
             print(data)
             raise Exception("No se encontró el archivo .m3u8 del video")
 
-    def download_from_twitch(self, url, output_file, quality="best"):
+    def download_from_twitch(self, url, output_file, quality="best", max_workers=8):
         if quality == "audio":
             output_file = output_file + ".ts"
+        import streamlink
+        from segment_downloader import SegmentDownloader
+
         streams = streamlink.streams(url)
         if quality in streams:
             stream = streams[quality]
             playlist_url = stream.url
             print(f"Downloading from {playlist_url}")
 
-            # Descargar el archivo M3U8
-            response = requests.get(playlist_url)
-            playlist_content = response.text
-
-            # Crear un directorio temporal para los segmentos
-            os.makedirs('temp_segments', exist_ok=True)
-
-            # Descargar cada segmento .ts
-            segment_urls = []
-            for line in tqdm.tqdm(playlist_content.splitlines()):
-                if line.endswith('.ts'):
-                    segment_url = os.path.join(os.path.dirname(playlist_url), line)
-                    segment_urls.append(segment_url)
-                    segment_response = requests.get(segment_url, stream=True)
-                    number, extension = line.split('.')
-                    line = f"{number:>07}.{extension}"
-                    segment_path = os.path.join('temp_segments', line)
-                    with open(segment_path, 'wb') as segment_file:
-                        for chunk in segment_response.iter_content(chunk_size=8192):
-                            if chunk:
-                                segment_file.write(chunk)
-
-            # Combinar los segmentos en un solo archivo
-            with open(output_file, 'wb') as of:
-                for segment_path in tqdm.tqdm(sorted(os.listdir('temp_segments'))):
-                    segment_path_full = os.path.join('temp_segments', segment_path)
-                    with open(segment_path_full, 'rb') as segment_file:
-                        bytes = segment_file.read()
-                        #print(f"Writing {len(bytes)} bytes from {segment_path} to {output_file}")
-                        of.write(bytes)
-
-            # Limpiar el directorio temporal
-            for segment_file in os.listdir('temp_segments'):
-                os.remove(os.path.join('temp_segments', segment_file))
-            os.rmdir('temp_segments')
+            # Descargar los segmentos .ts en paralelo y escribirlos en orden en el fichero de salida.
+            # El manifiesto permite reanudar la descarga si se corta a medias.
+            downloader = SegmentDownloader(max_workers=max_workers)
+            downloader.download(playlist_url, output_file,
+                                manifest_path=output_file + ".manifest.json", source=url)
 
             print(f"Downloaded to {output_file}")
         else:
@@ -156,6 +128,13 @@ class Recap:
 
 
     def ts_to_wav(self, ts_path, wav_path):
+        # Conversión por bloques con un único resampler (ver benchmarks/bench_ts_to_wav.py)
+        from audio_stream import ts_to_wav_chunked
+
+        ts_to_wav_chunked(ts_path, wav_path)
+
+    def ts_to_wav_by_frame(self, ts_path, wav_path):
+        # Conversión original frame a frame; se mantiene como referencia para el benchmark
         import av  # Asegurarse de que av está importado
 
         # Abrir el archivo multimedia
@@ -186,45 +165,126 @@ class Recap:
         container.close()
         output_container.close()
 
-    def ffmpeg_audio_download(self, url, output_file):
+    def ffmpeg_audio_download(self, url, output_file, resume=True, max_workers=8):
+        import streamlink
+        from segment_downloader import SegmentDownloader
+
         streams = streamlink.streams(url)
         stream = streams["audio"]
         playlist_url = stream.url
         print(f"Downloading from {playlist_url}")
+        input_file = playlist_url
+        if resume:
+            # Descargar primero los segmentos con manifiesto, para que un corte no obligue
+            # a empezar de cero, y convertir después el fichero local
+            input_file = output_file + ".ts"
+            downloader = SegmentDownloader(max_workers=max_workers)
+            downloader.download(playlist_url, input_file,
+                                manifest_path=input_file + ".manifest.json", source=url)
         # Ejecutar con subprocess
         import subprocess
-        subprocess.run(["ffmpeg", "-i", playlist_url, "-ac", "1", "-ar", "16000", 
+        subprocess.run(["ffmpeg", "-i", input_file, "-ac", "1", "-ar", "16000", 
                         "-ss", "00:09:50",
                         "-y", "-acodec", "copy", 
                         output_file], check=True)
 
     # Convertir el video a audio usando moviepy
     def video_to_audio(self, video_path, audio_path):
+        from moviepy.editor import VideoFileClip
+
         video_clip = VideoFileClip(video_path)
         audio_clip = video_clip.audio
         audio_clip.write_audiofile(audio_path)
         audio_clip.close()
         video_clip.close()
 
-    def transcribe(self, audio_path):
-        # Cargar el modelo Whisper
-        model = whisper.load_model("medium")
-
-        # Transcribir el audio con Whisper
-        transcription = whisper.transcribe(model, audio_path, language="es", verbose=True)
-        with open('transcription.json', 'w') as f:
+    def get_engine(self):
+        # Cargar el motor de transcripción (WHISPER_ENGINE, WHISPER_MODEL) una sola vez por hilo
+        engine = getattr(self.engines, "engine", None)
+        if engine is None:
+            from transcription_engines import get_engine
+
+            engine = get_engine()
+            engine.load()
+            self.engines.engine = engine
+        return engine
+
+    def transcribe_speech(self, audio_path):
+        """Transcribe solo las regiones con voz y devuelve los tiempos en la línea temporal original."""
+        import vad
+        from audio_stream import load_audio
+
+        audio = load_audio(audio_path)
+        regions = vad.detect_speech(audio)
+        vad.report(regions, len(audio) / vad.SAMPLE_RATE)
+        timeline = vad.SpeechTimeline(regions)
+        transcription = self.get_engine().transcribe(timeline.compact(audio), language="es", verbose=True)
+        return timeline.remap(transcription)
+
+    def transcribe(self, audio_path, vad=False, output_path='transcription.json'):
+        if vad:
+            # Saltar silencios y música antes de pasar el audio a Whisper
+            transcription = self.transcribe_speech(audio_path)
+        elif os.getenv('WHISPER_WORKER_ADDRESS'):
+            # Usar el worker con el modelo ya cargado (transcription_worker.py)
+            from transcription_worker import transcribe_remote
+
+            transcription, stats = transcribe_remote(audio_path)
+            print(f"Transcripción en el worker: RTF {stats['real_time_factor']:.2f}, "
+                  f"RSS pico del trabajo {stats['peak_rss_mb']:.0f} MB")
+        elif int(os.getenv('WHISPER_WORKERS', '1')) > 1:
+            # Repartir ventanas solapadas del audio entre varios procesos
+            from parallel_transcribe import transcribe_parallel
+
+            transcription = transcribe_parallel(audio_path, workers=int(os.getenv('WHISPER_WORKERS')))
+        else:
+            # Transcribir el audio con Whisper
+            transcription = self.get_engine().transcribe(audio_path, language="es", verbose=True)
+        with open(output_path, 'w') as f:
             json.dump(transcription, f)
 
         return transcription
     
+    def transcribe_stream(self, url, window_seconds=300, overlap=10, output_path='transcription.json'):
+        """Transcribe el audio del vídeo mientras se descarga, sin escribir el WAV a disco.
+
+        Las ventanas se solapan overlap segundos y se unen cortando por la mitad del solape,
+        como en parallel_transcribe, para no perder las palabras que caen en el corte.
+        """
+        import streamlink
+        from audio_stream import SAMPLE_RATE, PCMStream
+        from parallel_transcribe import merge_shards
+
+        streams = streamlink.streams(url)
+        playlist_url = streams["audio"].url
+        print(f"Streaming from {playlist_url}")
+        engine = self.get_engine()
+
+        shards = []
+        context = ""
+        language = "es"
+        for offset, audio in PCMStream(playlist_url, window_seconds=window_seconds, start="00:09:50",
+                                       overlap_seconds=overlap):
+            # Usar el final de lo ya transcrito como contexto para no perder continuidad
+            result = engine.transcribe(audio, language=language, verbose=True,
+                                       initial_prompt=context or None)
+            shards.append((offset, result["segments"]))
+            # El contexto de la siguiente ventana es lo que esta aporta antes del punto de corte
+            lower = overlap / 2 if offset > 0 else float('-inf')
+            cut = len(audio) / SAMPLE_RATE - overlap / 2
+            context = (context + "".join(segment["text"] for segment in result["segments"]
+                                         if lower <= segment["start"] < cut))[-200:]
+
+        segments = merge_shards(shards, overlap)
+        text = "".join(segment["text"] for segment in segments)
+        transcription = {"text": text, "segments": segments, "language": language}
+        with open(output_path, 'w') as f:
+            json.dump(transcription, f)
+
+        return transcription
+
     def download_twich_subtitles(self, video_id):
-        headers = {
-            'Client-ID': self.client_id,
-            'Authorization': f'Bearer {self.access_token}'
-        }
-        url = f'https://api.twitch.tv/helix/videos?id={video_id}'
-        response = requests.get(url, headers=headers)
-        data = response.json()
+        data = self.helix.get('videos', id=video_id)
         if 'data' in data and len(data['data']) > 0:
             video_data = data['data'][0]
             print(video_data.keys())
@@ -238,10 +298,46 @@ class Recap:
             print(data)
             raise Exception("No se encontraron subtítulos") 
  
+    def _chat(self, label, messages, **kwargs):
+        """Llama al LLM y guarda la latencia y los tokens/s de la respuesta en llm_stats.
+
+        Si hay caché, las respuestas se reutilizan para el mismo modelo, mensajes y opciones.
+        """
+        options = {"num_ctx": get_num_ctx()}
+        key = LLMCache.key(model, messages, options)
+        if self.llm_cache is not None:
+            response = self.llm_cache.get(key)
+            if response is not None:
+                print(f"[LLM] {label}: respuesta en caché")
+                return response
+        start = time.monotonic()
+        llm_client = self.openai_client or get_llm_client()
+        response = llm_client.chat(model=model, messages=messages, options=options, **kwargs)
+        elapsed = time.monotonic() - start
+        if self.llm_cache is not None:
+            self.llm_cache.put(key, {"message": {"role": "assistant", "content": response["message"]["content"]}})
+        tokens = response.get("eval_count") or 0
+        eval_seconds = (response.get("eval_duration") or 0) / 1e9
+        stats = {
+            "label": label,
+            "seconds": elapsed,
+            "prompt_tokens": response.get("prompt_eval_count") or 0,
+            "tokens": tokens,
+            "tokens_per_s": tokens / eval_seconds if eval_seconds else 0.0,
+        }
+        with self.stats_lock:
+            self.llm_stats.append(stats)
+        print(f"[LLM] {label}: {elapsed:.1f}s, {stats['prompt_tokens']} tokens de entrada, "
+              f"{tokens} generados a {stats['tokens_per_s']:.1f} tokens/s")
+        return response
+
     def _summarize(self, text, username):
+        highlight_note = ""
+        if HIGHLIGHT_MARK in text:
+            highlight_note = (f"Los fragmentos que empiezan por {HIGHLIGHT_MARK} son los momentos de más emoción "
+                              "del directo según el audio; dales prioridad al elegir los mejores momentos.\n")
         #response = client.chat.completions.create(
-        response = client.chat(
-            model=model,
+        response = self._chat("resumen parcial",
             messages=[
                 {"role": "system",
                 "content": """Te llamas Verónica. Eres un experto en resúmenes concisos de transcripciones de directos de Twitch.
@@ -258,7 +354,7 @@ class Recap:
                 Debes resaltar al menos 2 momentos importantes del directo.
                 Debe terminar con una conclusión y animando al próximo directo.
                 El resumen ha de ser conciso y no debe superar las 300 palabras.
-                Este es el texto a resumir:\n\n{text}"""}
+                {highlight_note}Este es el texto a resumir:\n\n{text}"""}
             ],
             #temperature=0.4,
             )
@@ -271,8 +367,7 @@ class Recap:
             text += summary + "\n***\n"
         #response = client.chat.completions.create(
         #    model="Qwen/Qwen2-7B-Instruct-GGUF",
-        response = client.chat(
-            model=model,
+        response = self._chat("unión",
             messages=[
                 {"role": "system",
                 "content": """Eres un experto en unir resumenes de un mismo capítulo.
@@ -288,23 +383,54 @@ class Recap:
         #return response.choices[0].message.content
         return response["message"]["content"]
 
+    def _reduce_summaries(self, summaries, pool, group_size):
+        # Unir los resúmenes por grupos, nivel a nivel, para que ningún prompt de unión sea enorme
+        while len(summaries) > 1:
+            groups = [summaries[i:i + group_size] for i in range(0, len(summaries), group_size)]
+            summaries = list(pool.map(
+                lambda group: group[0] if len(group) == 1 else self._join_summaries(group), groups))
+        return summaries[0]
+
     # Resumir el texto
-    def summarize_text(self, text, username):
+    def summarize_text(self, text, username, segments=None, concurrency=None, group_size=4,
+                       extractive_budget=None, highlights=None, highlights_only=False):
+        concurrency = concurrency or int(os.getenv('OLLAMA_CONCURRENCY', '2'))
         
-        if len(text) > 32767:
-            #divide the text in chunks of 32767 characters
-            chunks = [text[i:i+32767] for i in range(0, len(text), 32767)]
-            resumenes = []
-            for chunk in chunks:
-                resumenes.append(self._summarize(chunk, username))
-            resumen_largo = self._join_summaries(resumenes)
+        # Trocear por segmentos de Whisper (o por frases si solo hay texto) hasta llenar el contexto del modelo
+        segments = segments or segments_from_text(text)
+        # Quitar los bucles de repetición de Whisper antes de trocear, para no pagarlos en el prompt
+        cleaned = collapse_segments(segments)
+        print(f"Repeticiones eliminadas: {reduction(segments, cleaned):.1%} del texto")
+        if highlights and cleaned and "start" in cleaned[0]:
+            # Momentos de más intensidad según el audio (highlights.detect_highlights)
+            from highlights import in_highlight
+
+            if highlights_only:
+                cleaned = [segment for segment in cleaned if in_highlight(segment, highlights)]
+            else:
+                cleaned = [dict(segment, text=f" {HIGHLIGHT_MARK}{segment['text']}")
+                           if in_highlight(segment, highlights) else segment for segment in cleaned]
+        if extractive_budget:
+            # Pasar al LLM solo los tramos más representativos, hasta extractive_budget tokens
+            from extractive import extract
+
+            cleaned = extract(cleaned, model, extractive_budget)
+        chunks = chunk_segments(cleaned, model)
+        if len(chunks) > 1:
+            start = time.monotonic()
+            # Resumir los trozos en paralelo, tantos a la vez como admita el servidor de Ollama
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                resumenes = list(pool.map(lambda chunk: self._summarize(chunk, username), chunks))
+                partial = [stats for stats in self.llm_stats if stats["label"] == "resumen parcial"][-len(chunks):]
+                print(f"{len(chunks)} trozos resumidos en {time.monotonic() - start:.1f}s con {concurrency} "
+                      f"peticiones a la vez (suma de latencias {sum(s['seconds'] for s in partial):.1f}s)")
+                resumen_largo = self._reduce_summaries(resumenes, pool, group_size)
         else:
-            resumen_largo = self._summarize(text, username)
+            resumen_largo = self._summarize(chunks[0] if chunks else text, username)
 
         # Resumir el resumen
         #response = client.chat.completions.create(
-        response = client.chat(
-            model=model,
+        response = self._chat("resumen corto",
             messages=[
                 {"role": "system",
                 "content": """Eres un experto en resúmenes concisos. Nunca superas los 500 caracteres en el resumen.
@@ -363,57 +489,81 @@ class Recap:
     
 
 
-if __name__ == "__main__":
-    username = 'drpalanca'
-    recap = Recap(username, client, client_id, client_secret)
+def add_options(parser, suppress=False):
+    # En los subcomandos las opciones no tienen valor por defecto (SUPPRESS), para no pisar
+    # las que se hayan puesto antes del subcomando
+    def default(value):
+        return argparse.SUPPRESS if suppress else value
+
+    parser.add_argument("--video-id", default=default(None),
+                        help="Vídeo a procesar (por defecto, el último directo; en los "
+                             "subcomandos posteriores a fetch, el último vídeo del histórico)")
+    parser.add_argument("--stream", action="store_true", default=default(False),
+                        help="Transcribir mientras se descarga, sin escribir el WAV a disco")
+    parser.add_argument("--vad", action="store_true", default=default(False),
+                        help="Transcribir solo los tramos con voz")
+    parser.add_argument("--no-cache", action="store_true", default=default(False),
+                        help="Volver a preguntar al LLM aunque ya haya respuesta guardada")
+    parser.add_argument("--extractive", type=int, metavar="TOKENS", default=default(None),
+                        help="Preseleccionar los tramos más relevantes de la transcripción hasta TOKENS tokens")
+    parser.add_argument("--highlights", choices=("mark", "only"), default=default(None),
+                        help="Detectar los mejores momentos por el audio y marcarlos o resumir solo esos")
+    # El subcomando guarda sus --force-stage aparte y parse_args los junta con los de antes
+    parser.add_argument("--force-stage", action="append", choices=STAGES, default=default([]),
+                        dest="force_stage_command" if suppress else "force_stage",
+                        help="Repetir una etapa aunque esté al día (se puede indicar varias veces)")
+
+
+def build_parser():
+    # Las opciones valen antes o después del subcomando; sin subcomando se ejecutan todas las etapas
+    parser = argparse.ArgumentParser(description="Resume el último directo de Twitch")
+    add_options(parser)
+    subparsers = parser.add_subparsers(dest="command", metavar="{all," + ",".join(STAGES) + "}")
+    parser.set_defaults(command="all")
+    add_options(subparsers.add_parser("all", help="Todas las etapas (por defecto)"), suppress=True)
+    for stage in STAGES:
+        # Cada subcomando ejecuta su etapa reutilizando lo que ya haya de las anteriores
+        add_options(subparsers.add_parser(stage, help=f"Ejecutar hasta la etapa {stage}"), suppress=True)
+    return parser
+
+
+def parse_args(argv=None):
+    args = build_parser().parse_args(argv)
+    args.force_stage += vars(args).pop("force_stage_command", [])
+    return args
 
-    last_stream = recap.get_last_stream()
-    video_id = last_stream['id']
-    print(f"Último directo ID: {video_id}")
-    #video_id = 2177073636
 
-    m3u8_url = recap.get_m3u8_url(video_id)
-    print(f"URL del archivo .m3u8: {m3u8_url}")
-    
-    # Nombre del archivo de salida
-    audio_path = 'twitch_audio.wav'
-
-    with open('history.json', 'r') as history_fd:
-        history = json.load(history_fd)
-
-    if history["last"] != video_id:
-        history["last"] = video_id
-        history["historic"][video_id] = {
-            "date": datetime.datetime.now().isoformat(),
-            "transcription": "",
-            "summary_short": "",
-            "summary_long": ""
-        }
-        recap.ffmpeg_audio_download(m3u8_url, audio_path)
-    
-    if history["historic"][video_id]["transcription"] == "":
-        transcription = recap.transcribe(audio_path)
-        history["historic"][video_id]["transcription"] = transcription["text"]
-
-    with open('transcription.json') as f:
-        transcription = json.load(f)
-
-    summary_long, summary_short = recap.summarize_text(transcription["text"], username)
-    print(summary_long)
-    print("====================================")
-    print(summary_short)
-
-    history["historic"][video_id]["summary_short"] = summary_short
-    history["historic"][video_id]["summary_long"] = summary_long
-    with open('history.json', 'w') as history_fd:
-        json.dump(history, history_fd)
-
-    # Crea un public gist en GitHub con el resumen y dame la url
-    url = recap.create_gist(summary_long)
-    print(f"Resumen: {url}")
-
-    with open('summary.txt', 'w') as f:
-        f.write(summary_short)
-        f.write(f"\n\n Resumen completo: {url}")
+if __name__ == "__main__":
+    args = parse_args()
+
+    username = 'drpalanca'
+    llm_cache = None if args.no_cache else LLMCache()
+    recap = Recap(username, client_id=client_id, client_secret=client_secret, llm_cache=llm_cache)
+
+    # La primera vez se importa el antiguo history.json a la base de datos
+    migrate = not os.path.exists('history.db') and os.path.exists('history.json')
+    history = HistoryStore('history.db')
+    if migrate:
+        history.migrate_from_json('history.json')
+
+    video_id = args.video_id
+    if video_id is None and args.command not in ("all", "fetch"):
+        # Relanzar una etapa posterior no necesita preguntar a Twitch: se usa el último vídeo procesado
+        video_id = history.get_last()
+    if video_id is None:
+        last_stream = recap.get_last_stream()
+        video_id = last_stream['id']
+        print(f"Último directo ID: {video_id}")
+
+    # Cada etapa deja su resultado en work/<video_id>/ y solo se repite lo que ha cambiado
+    pipeline = Pipeline(recap, history, video_id, model, force_stages=args.force_stage,
+                        stream=args.stream, vad=args.vad, extractive_budget=args.extractive,
+                        highlights=args.highlights)
+    if args.command == "all":
+        pipeline.run()
+    else:
+        pipeline.run(until=args.command, reuse_previous=True)
+    if llm_cache is not None:
+        llm_cache.report()
     
     #recap.download_twich_subtitles(video_id)
@@ -0,0 +1,96 @@
+# Motores de transcripción intercambiables. Todos devuelven el formato de whisper.transcribe:
+# {"text": ..., "segments": [{"id", "seek", "start", "end", "text", ...}], "language": ...}
+#
+# Se eligen con WHISPER_ENGINE (whisper, faster-whisper) y WHISPER_MODEL (tiny, base, small, medium...)
+
+import os
+
+
+class TranscriptionEngine:
+    name = None
+
+    def __init__(self, model_name="medium", threads=0):
+        self.model_name = model_name
+        self.threads = threads
+        self.model = None
+
+    def load(self):
+        raise NotImplementedError
+
+    def transcribe(self, audio, language="es", verbose=False, initial_prompt=None):
+        """Transcribe una ruta de fichero o un array float32 mono de 16 kHz."""
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{self.name}:{self.model_name}"
+
+
+class WhisperEngine(TranscriptionEngine):
+    """openai-whisper en fp32; el motor original."""
+    name = "whisper"
+
+    def load(self):
+        import whisper
+        if self.threads:
+            import torch
+            torch.set_num_threads(self.threads)
+        self.model = whisper.load_model(self.model_name)
+
+    def transcribe(self, audio, language="es", verbose=False, initial_prompt=None):
+        import whisper
+        if self.model is None:
+            self.load()
+        return whisper.transcribe(self.model, audio, language=language, verbose=verbose,
+                                  initial_prompt=initial_prompt)
+
+
+class FasterWhisperEngine(TranscriptionEngine):
+    """faster-whisper (CTranslate2) con pesos cuantizados a int8 en CPU."""
+    name = "faster-whisper"
+
+    def __init__(self, model_name="medium", threads=0, compute_type="int8"):
+        super().__init__(model_name, threads)
+        self.compute_type = compute_type
+
+    def load(self):
+        from faster_whisper import WhisperModel
+        self.model = WhisperModel(self.model_name, device="cpu", compute_type=self.compute_type,
+                                  cpu_threads=self.threads)
+
+    def transcribe(self, audio, language="es", verbose=False, initial_prompt=None):
+        if self.model is None:
+            self.load()
+        segments_iter, info = self.model.transcribe(audio, language=language,
+                                                    initial_prompt=initial_prompt)
+        segments = []
+        for segment in segments_iter:
+            if verbose:
+                print(f"[{segment.start:.2f} --> {segment.end:.2f}] {segment.text}")
+            segments.append({
+                "id": len(segments),
+                "seek": segment.seek,
+                "start": segment.start,
+                "end": segment.end,
+                "text": segment.text,
+                "tokens": list(segment.tokens),
+                "temperature": segment.temperature,
+                "avg_logprob": segment.avg_logprob,
+                "compression_ratio": segment.compression_ratio,
+                "no_speech_prob": segment.no_speech_prob,
+            })
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "language": info.language,
+        }
+
+
+ENGINES = {engine.name: engine for engine in (WhisperEngine, FasterWhisperEngine)}
+
+
+def get_engine(name=None, model_name=None, threads=0):
+    name = name or os.getenv('WHISPER_ENGINE', 'whisper')
+    model_name = model_name or os.getenv('WHISPER_MODEL', 'medium')
+    if name not in ENGINES:
+        raise Exception(f"Motor de transcripción desconocido: {name}. Disponibles: {', '.join(ENGINES)}")
+    return ENGINES[name](model_name, threads=threads)
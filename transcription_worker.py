@@ -0,0 +1,141 @@
+# Proceso de larga duración que mantiene el modelo Whisper cargado y atiende trabajos de transcripción
+#
+# Uso: python transcription_worker.py
+# Y en el .env de summarize.py: WHISPER_WORKER_ADDRESS=localhost:6001
+#
+# WHISPER_WORKER_KEY es obligatoria y tiene que ser la misma en los dos lados: la conexión
+# deserializa (pickle) lo que recibe, así que quien conozca la clave puede ejecutar código en el worker
+
+import os
+import resource
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+import psutil
+from dotenv import load_dotenv
+
+from audio_stream import SAMPLE_RATE, load_audio
+from transcription_engines import get_engine
+
+load_dotenv()
+
+DEFAULT_ADDRESS = "localhost:6001"
+
+
+def parse_address(address):
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+def get_authkey():
+    key = os.getenv('WHISPER_WORKER_KEY')
+    if not key:
+        raise Exception("Falta WHISPER_WORKER_KEY: define una clave secreta para el worker de transcripción")
+    return key.encode()
+
+
+def peak_rss_mb():
+    """Pico de RSS de toda la vida del proceso (ru_maxrss está en KB en Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class RSSSampler:
+    """Muestrea el RSS del proceso en un hilo mientras dura un trabajo y guarda el máximo.
+
+    ru_maxrss no baja nunca, así que después de un trabajo grande no dice nada de los siguientes.
+    """
+
+    def __init__(self, interval=0.2):
+        self.process = psutil.Process()
+        self.interval = interval
+        self.peak = 0
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while True:
+            self.peak = max(self.peak, self.process.memory_info().rss)
+            if self.stop.wait(self.interval):
+                break
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop.set()
+        self.thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def peak_mb(self):
+        return self.peak / (1024 * 1024)
+
+
+class TranscriptionWorker:
+    def __init__(self, engine=None, address=None):
+        self.engine = engine or get_engine()
+        self.address = parse_address(address or os.getenv('WHISPER_WORKER_ADDRESS', DEFAULT_ADDRESS))
+        self.load_time = None
+
+    def load(self):
+        start = time.monotonic()
+        self.engine.load()
+        self.load_time = time.monotonic() - start
+        print(f"Modelo {self.engine} cargado en {self.load_time:.1f}s, RSS pico del proceso {peak_rss_mb():.0f} MB")
+
+    def run_job(self, job):
+        start = time.monotonic()
+        with RSSSampler() as sampler:
+            audio = load_audio(job["audio_path"])
+            transcription = self.engine.transcribe(audio, language=job.get("language", "es"),
+                                                   verbose=job.get("verbose", False))
+        elapsed = time.monotonic() - start
+        duration = len(audio) / SAMPLE_RATE
+        stats = {
+            "model": repr(self.engine),
+            "load_time": self.load_time,
+            "audio_seconds": duration,
+            "seconds": elapsed,
+            "real_time_factor": elapsed / duration if duration else None,
+            # Pico durante este trabajo y pico de toda la vida del worker
+            "peak_rss_mb": sampler.peak_mb(),
+            "lifetime_peak_rss_mb": peak_rss_mb(),
+        }
+        print(f"Transcrito {job['audio_path']}: {duration:.0f}s de audio en {elapsed:.0f}s "
+              f"(RTF {stats['real_time_factor'] or 0:.2f}), RSS pico del trabajo {stats['peak_rss_mb']:.0f} MB, "
+              f"del proceso {stats['lifetime_peak_rss_mb']:.0f} MB")
+        return transcription, stats
+
+    def serve(self):
+        if self.load_time is None:
+            self.load()
+        with Listener(self.address, authkey=get_authkey()) as listener:
+            print(f"Worker de transcripción escuchando en {self.address[0]}:{self.address[1]}")
+            while True:
+                with listener.accept() as conn:
+                    try:
+                        job = conn.recv()
+                        transcription, stats = self.run_job(job)
+                        conn.send({"transcription": transcription, "stats": stats})
+                    except (EOFError, ConnectionError) as e:
+                        print(f"Conexión cerrada por el cliente: {e}")
+                    except Exception as e:
+                        print(f"Error en el trabajo de transcripción: {e}")
+                        conn.send({"error": str(e)})
+
+
+def transcribe_remote(audio_path, address=None, language="es"):
+    """Envía un trabajo al worker y devuelve (transcripción, estadísticas)."""
+    address = parse_address(address or os.getenv('WHISPER_WORKER_ADDRESS', DEFAULT_ADDRESS))
+    with Client(address, authkey=get_authkey()) as conn:
+        # El audio se lee en el worker, así que la ruta tiene que ser válida allí
+        conn.send({"audio_path": os.path.abspath(audio_path), "language": language})
+        response = conn.recv()
+    if "error" in response:
+        raise Exception(f"Error en el worker de transcripción: {response['error']}")
+    return response["transcription"], response["stats"]
+
+
+if __name__ == "__main__":
+    TranscriptionWorker().serve()
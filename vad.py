@@ -0,0 +1,91 @@
+# Detección de voz por energía y forma del espectro, para no pasar silencios ni música a Whisper
+
+import librosa
+import numpy as np
+
+from audio_features import FRAME_LENGTH, frame_time, stft_blocks
+from audio_stream import SAMPLE_RATE
+
+
+def frame_features(audio):
+    """Devuelve por frame la energía en dB, la fracción de energía en la banda de voz y la planitud espectral."""
+    freqs = librosa.fft_frequencies(sr=SAMPLE_RATE, n_fft=FRAME_LENGTH)
+    voice_band = (freqs >= 300) & (freqs <= 3400)
+    energy, voice_ratio, flatness = [], [], []
+    for magnitude in stft_blocks(audio):
+        power = magnitude ** 2
+        total = power.sum(axis=0) + 1e-10
+        energy.append(10 * np.log10(total / FRAME_LENGTH))
+        voice_ratio.append(power[voice_band].sum(axis=0) / total)
+        flatness.append(librosa.feature.spectral_flatness(S=power, power=1.0)[0])
+    if not energy:
+        return np.empty(0), np.empty(0), np.empty(0)
+    return np.concatenate(energy), np.concatenate(voice_ratio), np.concatenate(flatness)
+
+
+def detect_speech(audio, min_speech=0.5, min_silence=0.8, padding=0.3,
+                  energy_margin=12.0, min_voice_ratio=0.5, max_flatness=0.4):
+    """Devuelve la lista de regiones (inicio, fin) en segundos que probablemente contienen voz.
+
+    Un frame es voz si supera en energy_margin dB el suelo de ruido, si la mayor parte de
+    su energía está en la banda de voz (300-3400 Hz) y si no es ruido plano. Las regiones
+    separadas por menos de min_silence se unen, se amplían padding segundos por cada
+    lado y se descartan las de menos de min_speech segundos.
+    """
+    energy, voice_ratio, flatness = frame_features(audio)
+    if len(energy) == 0:
+        return []
+    noise_floor = np.percentile(energy, 10)
+    speech = (energy > noise_floor + energy_margin) & (voice_ratio > min_voice_ratio) & (flatness < max_flatness)
+
+    # Suavizar decisiones sueltas: cada frame toma la mayoría de sus vecinos
+    width = 9
+    speech = np.convolve(speech.astype(np.float32), np.ones(width) / width, mode='same') > 0.5
+
+    # Inicios y finales de cada tramo de voz
+    edges = np.diff(np.concatenate(([0], speech.astype(np.int8), [0])))
+    starts = frame_time(np.flatnonzero(edges == 1))
+    ends = frame_time(np.flatnonzero(edges == -1)) + FRAME_LENGTH / SAMPLE_RATE
+
+    duration = len(audio) / SAMPLE_RATE
+    regions = []
+    for start, end in zip(starts, ends):
+        start, end = max(0.0, start - padding), min(duration, end + padding)
+        if regions and start - regions[-1][1] < min_silence:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return [(start, end) for start, end in regions if end - start >= min_speech]
+
+
+class SpeechTimeline:
+    """Une las regiones de voz en un único audio y traduce sus tiempos a los del audio original."""
+
+    def __init__(self, regions):
+        self.original_starts = np.array([start for start, _ in regions])
+        lengths = np.array([end - start for start, end in regions])
+        self.compact_starts = np.concatenate(([0.0], np.cumsum(lengths)[:-1])) if len(regions) else np.empty(0)
+        self.regions = regions
+
+    def compact(self, audio):
+        return np.concatenate([audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)]
+                               for start, end in self.regions]) if self.regions else audio[:0]
+
+    def to_original(self, t):
+        index = max(0, np.searchsorted(self.compact_starts, t, side='right') - 1)
+        return float(self.original_starts[index] + t - self.compact_starts[index])
+
+    def remap(self, transcription):
+        for segment in transcription["segments"]:
+            segment["start"] = self.to_original(segment["start"])
+            segment["end"] = self.to_original(segment["end"])
+            segment["seek"] = int(segment["start"] * 100)
+        return transcription
+
+
+def report(regions, duration):
+    speech = sum(end - start for start, end in regions)
+    skipped = duration - speech
+    print(f"VAD: {len(regions)} regiones de voz, {speech:.0f}s de {duration:.0f}s; "
+          f"se omiten {skipped:.0f}s ({skipped / duration if duration else 0:.1%})")
+    return {"regions": len(regions), "speech_seconds": speech, "skipped_seconds": skipped}